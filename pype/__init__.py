@@ -1,8 +1,52 @@
-from .pipeline import Pipeline
-from .lib_import import *
-import pkg_resources
-
-try:
-    __version__ = pkg_resources.get_distribution(__name__).version
-except:
-    __version__ = 'unknown'
+import importlib
+
+from .component import *
+
+# Everything else is imported on first use: libraries which only need the
+# @component decorator, like timeseries, must not load the compiler.
+_LAZY = {
+  'Pipeline': 'pipeline',
+  'compile_many': 'pipeline',
+  'ParallelExecutor': 'executor',
+  'CompileCache': 'cache',
+  'Memo': 'memo',
+  'PipelineServer': 'server',
+  'LibraryImporter': 'lib_import',
+  'Symbol': 'symtab',
+  'SymbolType': 'symtab',
+  'SymbolTable': 'symtab',
+}
+_SUBMODULES = set(['ast', 'batch', 'cache', 'cli', 'component', 'executor', 'fgir',
+  'incremental', 'lexer', 'lib_import', 'memo', 'optimize', 'parser', 'pcode', 'pipeline', 'profile',
+  'semantic_analysis', 'server', 'stream', 'symtab', 'translate', 'transpile', 'typecheck'])
+
+def _version():
+  # importlib.metadata is new in Python 3.8: before, its backport or
+  # pkg_resources looks the version up
+  try:
+    from importlib.metadata import version, PackageNotFoundError
+  except ImportError:
+    try:
+      from importlib_metadata import version, PackageNotFoundError
+    except ImportError:
+      import pkg_resources
+      try:
+        return pkg_resources.get_distribution(__name__).version
+      except pkg_resources.DistributionNotFound:
+        return 'unknown'
+  try:
+    return version(__name__)
+  except PackageNotFoundError:
+    return 'unknown'
+
+def __getattr__(name):
+  if name in _LAZY:
+    value = getattr(importlib.import_module('.'+_LAZY[name], __name__), name)
+  elif name in _SUBMODULES:
+    value = importlib.import_module('.'+name, __name__)
+  elif name == '__version__':
+    value = _version()
+  else:
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+  globals()[name] = value
+  return value
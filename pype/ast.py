@@ -1,3 +1,5 @@
+import sys
+
 class ASTVisitor():
   """
     A class that takes no arguments and is generally used with the walk method of an AST
@@ -36,13 +38,47 @@ class ASTModVisitor(ASTVisitor):
     # Note that this overrides the super's implementation, because we need a
     # non-None return value.
     return astnode
-  def post_visit(self, visit_value, child_values):
+  def post_visit(self, node, visit_value, child_values):
     '''A function which constructs a return value out of its children.
     This can be used to modify an AST by returning a different or modified
     ASTNode than the original. The top-level return value will then be the
     new AST.'''
     return visit_value
 
+class MultiVisitor(ASTVisitor):
+  """
+    A class that takes any number of visitors and runs them all in a single
+    traversal of an AST: each node is visited by every visitor, in order,
+    before the traversal moves on
+
+    Parameters
+    ----------
+    visitors: ASTVisitor objects
+
+    Returns
+    -------
+    return_value: list
+        returns the return values of the visitors, in order
+
+    Examples
+    --------
+    >>> class Count(ASTVisitor):
+    ...   def __init__(self): self.n = 0
+    ...   def visit(self, node): self.n += 1
+    ...   def return_value(self): return self.n
+    >>> a = ASTNode()
+    >>> a.children = [ASTNode(),ASTNode()]
+    >>> a.walk(MultiVisitor(Count(), Count()))
+    [3, 3]
+  """
+  def __init__(self, *visitors):
+    self.visitors = visitors
+  def visit(self, node):
+    for visitor in self.visitors:
+      visitor.visit(node)
+  def return_value(self):
+    return [visitor.return_value() for visitor in self.visitors]
+
 class ASTNode(object):
   """
     A class that takes no arguments and defines a node in an abstract syntax tree
@@ -83,15 +119,21 @@ class ASTNode(object):
     >>> d = ASTVisitor()
     >>> a.walk(d)
   """
+  # Programs are kept resident by the thousand, so nodes have no __dict__:
+  # subclasses declare their attributes in __slots__ too, and children are
+  # kept in a tuple (leaves all share the empty one).
+  __slots__ = ('parent', '_children')
+
   def __init__(self):
     self.parent = None
-    self._children = []
+    self._children = ()
 
   @property
   def children(self):
     return self._children
   @children.setter
   def children(self, children):
+    children = tuple(children)
     self._children = children
     for child in children:
       child.parent = self
@@ -122,23 +164,38 @@ class ASTNode(object):
     This is a depth-first, pre-order traversal. Parents will be visited before
     any children, children will be visited in order, and (by extension) a node's
     children will all be visited before its siblings.
-    The visitor may modify attributes, but may not add or delete nodes.'''
-    # TODO
-    visitor.visit(self)
-    for child in self.children:
-        child.walk(visitor)
+    The visitor may modify attributes, but may not add or delete nodes.
+    The traversal uses an explicit stack rather than recursion, so that deeply
+    nested programs do not hit the recursion limit; to run several visitors in
+    a single traversal, combine them with MultiVisitor.'''
+    stack = [self]
+    while stack:
+      node = stack.pop()
+      visitor.visit(node)
+      stack.extend(reversed(node.children))
     return visitor.return_value()
 
   def mod_walk(self, mod_visitor):
     '''Traverses an AST, building up a return value from visitor methods.
     Similar to walk(), but constructs a return value from the result of
     postvisit() calls. This can be used to modify an AST by building up the
-    desired new AST with return values.'''
-
-    selfval = mod_visitor.visit(self)
-    child_values = [child.mod_walk(mod_visitor) for child in self.children]
-    retval = mod_visitor.post_visit(self, selfval, child_values)
-    return retval
+    desired new AST with return values.
+    Like walk(), this uses an explicit stack rather than recursion.'''
+    # Frames are [node, visit value, child values, index of the next child]
+    stack = [[self, mod_visitor.visit(self), [], 0]]
+    while True:
+      frame = stack[-1]
+      children = frame[0].children
+      if frame[3] < len(children):
+        child = children[frame[3]]
+        frame[3] += 1
+        stack.append([child, mod_visitor.visit(child), [], 0])
+        continue
+      stack.pop()
+      retval = mod_visitor.post_visit(frame[0], frame[1], frame[2])
+      if not stack:
+        return retval
+      stack[-1][2].append(retval)
 
 
 class ASTProgram(ASTNode):
@@ -169,6 +226,7 @@ class ASTProgram(ASTNode):
     >>> d = ASTVisitor()
     >>> a.walk(d)
   """
+  __slots__ = ()
   def __init__(self, statements):
     super().__init__()
     self.children = statements
@@ -202,9 +260,10 @@ class ASTImport(ASTNode):
     >>> b.module
     'mod'
   """
+  __slots__ = ('mod',)
   def __init__(self, mod):
     super().__init__()
-    self.mod = mod
+    self.mod = sys.intern(mod)
   @property
   def module(self):
     return self.mod
@@ -244,6 +303,7 @@ class ASTComponent(ASTNode):
         ASTID
         ASTNode
   """
+  __slots__ = ()
   def __init__(self,name,expressions):
     super().__init__()
     self.children = [ASTID(name),*expressions]
@@ -280,6 +340,7 @@ class ASTInputExpr(ASTNode):
       ASTID
       ASTNode
   """
+  __slots__ = ()
   def __init__(self,declaration_list=None):
     super().__init__()
     if declaration_list:
@@ -309,6 +370,7 @@ class ASTOutputExpr(ASTNode):
     >>> [child.parent.__class__.__name__ for child in a.children]
     ['ASTOutputExpr', 'ASTOutputExpr']
   """
+  __slots__ = ()
   def __init__(self,declaration_list=None):
     super().__init__()
     if declaration_list:
@@ -341,6 +403,7 @@ class ASTAssignmentExpr(ASTNode):
     >>> a.value.__class__.__name__
     'ASTNode'
   """
+  __slots__ = ()
   def __init__(self,ID,expression):
     super().__init__()
     self.children = [ASTID(ID), expression]
@@ -381,8 +444,10 @@ class ASTEvalExpr(ASTNode):
     >>> [child.__class__.__name__ for child in a.children]
     ['ASTID']
   """
-  def __init__(self,oper,argms):
+  __slots__ = ('position',)
+  def __init__(self,oper,argms,position=None):
     super().__init__()
+    self.position = position # (line, column) in the source, if parsed
     if len(argms) > 0:
       self.children = [oper,*argms]
     else:
@@ -419,10 +484,12 @@ class ASTID(ASTNode):
     >>> a.type
     'component'
   """
+  __slots__ = ('name', 'type')
   def __init__(self, name, typedecl=None):
     super().__init__()
-    self.name = name
-    self.type = typedecl
+    # Identifiers repeat throughout a program, and across programs
+    self.name = sys.intern(name) if isinstance(name, str) else name
+    self.type = sys.intern(typedecl) if isinstance(typedecl, str) else typedecl
 
 class ASTLiteral(ASTNode):
   """
@@ -448,8 +515,9 @@ class ASTLiteral(ASTNode):
     >>> a.type
     'Scalar'
   """
+  __slots__ = ('value',)
+  type = 'Scalar'
   def __init__(self, value):
     super().__init__()
     self.value = value
-    self.type = 'Scalar'
 
@@ -0,0 +1,100 @@
+import collections
+import numbers
+import operator
+
+import numpy as np
+
+from .lib_import import vectorized_kernel, generic_operator
+
+# Operators which work unchanged on stacked numpy arrays, by broadcasting
+ARRAY_OPERATORS = set([operator.add, operator.sub, operator.mul, operator.truediv, operator.neg])
+
+# A batch of series sharing one time axis: data has one row per series
+Stacked = collections.namedtuple('Stacked','time data')
+
+def _is_series(value):
+  return hasattr(value, 'time') and hasattr(value, 'data')
+
+def _stack(pcode, batch):
+  '''Stacks every input across the batch, or returns None if the batch cannot
+  run vectorized: series must share their time axis, and every instruction
+  needs an array kernel.'''
+  kernels = []
+  for ins in pcode.instructions:
+    if generic_operator(ins.func) in ARRAY_OPERATORS:
+      kernels.append(generic_operator(ins.func))
+    elif vectorized_kernel(ins.func) is not None:
+      kernels.append(vectorized_kernel(ins.func))
+    else:
+      return None
+  stacked = []
+  for j in range(len(pcode.inputs)):
+    values = [args[j] for args in batch]
+    if all(_is_series(v) for v in values):
+      time = values[0].time
+      if any(len(v.time) != len(time) for v in values):
+        return None
+      if not (np.stack([v.time for v in values]) == time).all():
+        return None
+      stacked.append(Stacked(time, np.stack([v.data for v in values])))
+    elif all(isinstance(v, numbers.Real) for v in values):
+      stacked.append(np.array(values))
+    else:
+      return None
+  return kernels, stacked
+
+def _apply(kernel, args):
+  'Runs one kernel over stacked values: series are 2-D, scalars 1-D.'
+  times = [a.time for a in args if isinstance(a, Stacked)]
+  if times:
+    for t in times[1:]:
+      if t is not times[0] and not np.array_equal(t, times[0]):
+        raise ValueError('Series in a batch must have the same times')
+    # Scalars become columns, so that they broadcast along each series
+    args = [a.data if isinstance(a, Stacked) else (a[:,None] if np.ndim(a)==1 else a) for a in args]
+  result = kernel(*args)
+  if np.ndim(result) == 2:
+    return Stacked(times[0] if times else None, result)
+  return result
+
+def _unstack(value, n, series_type):
+  if isinstance(value, Stacked):
+    return [series_type(value.time, row) for row in value.data]
+  if np.ndim(value) == 0:
+    return [value]*n
+  return list(value)
+
+def run_batch(pcode, inputs):
+  '''Runs a PCode over a batch of inputs, one instruction at a time across the
+  whole batch; see PCode.run_batch.'''
+  if len(pcode.inputs) == 1:
+    batch = [(args,) for args in inputs]
+  else:
+    batch = [tuple(args) for args in inputs]
+  for args in batch:
+    if len(args) != len(pcode.inputs):
+      raise TypeError('%s() takes %d input(s) but %d were given' % (pcode.name, len(pcode.inputs), len(args)))
+  if not batch:
+    return []
+  plan = _stack(pcode, batch)
+  if plan is not None:
+    kernels, stacked = plan
+    env = pcode.constants.copy()
+    env.update(zip(pcode.inputs, stacked))
+    for (kernel,(dest,func,argnames)) in zip(kernels, pcode.instructions):
+      env[dest] = _apply(kernel, [env[a] for a in argnames])
+    series_type = next((type(v) for v in batch[0] if _is_series(v)), None)
+    columns = [_unstack(env[o], len(batch), series_type) for o in pcode.outputs]
+  else:
+    envs = []
+    for args in batch:
+      env = pcode.constants.copy()
+      env.update(zip(pcode.inputs, args))
+      envs.append(env)
+    for (dest,func,argnames) in pcode.instructions:
+      for env in envs:
+        env[dest] = func(*[env[a] for a in argnames])
+    columns = [[env[o] for env in envs] for o in pcode.outputs]
+  if len(pcode.outputs) == 1:
+    return columns[0]
+  return list(zip(*columns)) or [()]*len(batch)
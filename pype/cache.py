@@ -0,0 +1,172 @@
+import hashlib
+import importlib
+import os
+import pickle
+import re
+import sys
+import tempfile
+
+from .component import declaring_modules
+
+# Bump whenever the layout of compiled programs changes
+CACHE_FORMAT = 6
+
+IMPORT_RE = re.compile(r'\(\s*import\s+([a-zA-Z_][a-zA-Z_0-9.]*)\s*\)')
+COMMENT_RE = re.compile(r'#.*')
+
+def default_directory():
+  return os.environ.get('PYPE_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'pype')
+
+def _stamp(path):
+  st = os.stat(path)
+  return (os.path.basename(path), st.st_size, st.st_mtime_ns)
+
+def module_version(modname):
+  '''Returns what identifies the version of an imported library: its
+  __version__, and the size and modification time of the source of the
+  module and of every module of its package declaring components or kernels,
+  which change during development even when the version does not.'''
+  mod = importlib.import_module(modname)
+  stamps = [str(getattr(mod, '__version__', None))]
+  names = set([modname])
+  names.update(m for m in declaring_modules() if m.startswith(modname+'.'))
+  for name in sorted(names):
+    path = getattr(sys.modules.get(name), '__file__', None)
+    if path:
+      stamps.append((name,)+_stamp(path))
+  return tuple(stamps)
+
+def pype_version():
+  '''Returns what identifies the version of the compiler: the size and
+  modification time of each of its sources, since its installed version
+  does not change with them.'''
+  directory = os.path.dirname(os.path.abspath(__file__))
+  return tuple(_stamp(os.path.join(directory, name)) for name in sorted(os.listdir(directory)) if name.endswith('.py'))
+
+class CompileCache(object):
+  """
+    A class that defines a persistent cache of compiled PyPE programs, stored as
+    pickles in a directory and evicted least recently used first
+
+    Parameters
+    ----------
+    directory: where to keep the cache, by default $PYPE_CACHE_DIR or ~/.cache/pype
+    max_size: the maximum total size of the cache, in bytes
+
+    Returns
+    -------
+    key(source, options): string
+        returns the key of a program: a hash of its source, of the compile
+        options, of the version and sources of pype and of the versions and
+        component sources of the libraries it imports; or None if an import
+        cannot be resolved
+    load(key): object
+        returns the cached program, or None
+    store(key, program): None
+        caches a program, if it can be pickled, then evicts old entries
+    hits, misses: int
+        counts of load() calls which found or missed their key
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as d:
+    ...     cache = CompileCache(d)
+    ...     k = cache.key('{ c (input x) (output x) }', ())
+    ...     cache.load(k) is None
+    ...     cache.store(k, {'compiled':True})
+    ...     cache.load(k)
+    True
+    {'compiled': True}
+  """
+  def __init__(self, directory=None, max_size=64*1024*1024):
+    self.directory = directory or default_directory()
+    self.max_size = max_size
+    self.hits = 0
+    self.misses = 0
+
+  def __repr__(self):
+    return '<CompileCache %s, hits=%d, misses=%d>' % (self.directory, self.hits, self.misses)
+
+  def key(self, source, options):
+    from . import __version__
+    h = hashlib.sha256()
+    h.update(repr((CACHE_FORMAT, __version__, pype_version(), tuple(options))).encode())
+    for modname in sorted(set(IMPORT_RE.findall(COMMENT_RE.sub('', source)))):
+      try:
+        h.update(repr((modname, module_version(modname))).encode())
+      except Exception:
+        return None
+    h.update(source.encode())
+    return h.hexdigest()
+
+  def _path(self, key):
+    return os.path.join(self.directory, key+'.pickle')
+
+  def load(self, key):
+    path = self._path(key)
+    try:
+      with open(path, 'rb') as f:
+        program = pickle.load(f)
+    except Exception:
+      # Missing, or unreadable: a corrupt or stale entry is just a miss
+      self.misses += 1
+      return None
+    try:
+      os.utime(path) # Recently used
+    except OSError:
+      pass
+    self.hits += 1
+    return program
+
+  def store(self, key, program):
+    try:
+      data = pickle.dumps(program, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+      # Programs using functions which cannot be pickled by reference, like
+      # closures, are not cached.
+      return
+    os.makedirs(self.directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+    try:
+      with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+      os.replace(tmp, self._path(key))
+    except OSError:
+      if os.path.exists(tmp):
+        os.remove(tmp)
+      return
+    self.evict()
+
+  def entries(self):
+    '''Returns (mtime, size, path) of every entry, least recently used first.'''
+    result = []
+    try:
+      names = os.listdir(self.directory)
+    except OSError:
+      return result
+    for name in names:
+      if name.endswith('.pickle'):
+        path = os.path.join(self.directory, name)
+        try:
+          st = os.stat(path)
+        except OSError:
+          continue
+        result.append((st.st_mtime, st.st_size, path))
+    return sorted(result)
+
+  def evict(self):
+    entries = self.entries()
+    total = sum(size for (_,size,_) in entries)
+    for (_,size,path) in entries:
+      if total <= self.max_size:
+        break
+      try:
+        os.remove(path)
+      except OSError:
+        pass
+      total -= size
+
+  def clear(self):
+    for (_,_,path) in self.entries():
+      os.remove(path)
@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+
+from .pipeline import Pipeline
+
+def compile_command(args):
+  output = args.output or os.path.splitext(args.source)[0]+'_ppl.py'
+  pipeline = Pipeline(args.source,
+                      constant_folding=not args.no_constant_folding,
+                      subexpression_elimination=not args.no_subexpression_elimination)
+  with open(output, 'w') as f:
+    f.write(pipeline.transpile())
+  return 0
+
+def serve_command(args):
+  from .server import PipelineServer
+  def announce(address):
+    where = address if args.socket else '%s:%d' % address[:2]
+    print('pype: serving on %s' % where, flush=True)
+  server = PipelineServer(args.sources, max_batch=args.max_batch, max_delay=args.max_delay/1000.)
+  try:
+    server.serve_forever(path=args.socket, port=args.port, ready=announce)
+  except KeyboardInterrupt:
+    pass
+  return 0
+
+def main(argv=None):
+  '''The pype command line: pype compile foo.ppl -o foo_ppl.py, or
+  pype serve foo.ppl --socket /tmp/pype.sock'''
+  parser = argparse.ArgumentParser(prog='pype')
+  commands = parser.add_subparsers(dest='command')
+  compile_parser = commands.add_parser('compile', help='translate a .ppl file to an importable Python module')
+  compile_parser.add_argument('source', help='the .ppl file')
+  compile_parser.add_argument('-o', '--output', help='the Python file to write, by default <source>_ppl.py')
+  compile_parser.add_argument('--no-constant-folding', action='store_true')
+  compile_parser.add_argument('--no-subexpression-elimination', action='store_true')
+  compile_parser.set_defaults(run=compile_command)
+  serve_parser = commands.add_parser('serve', help='serve the components of .ppl files on a local socket, batching requests')
+  serve_parser.add_argument('sources', nargs='+', help='the .ppl files')
+  serve_parser.add_argument('--socket', help='the Unix socket to listen on')
+  serve_parser.add_argument('--port', type=int, default=0, help='the local TCP port to listen on, if no socket is given; by default one the system picks, which is printed')
+  serve_parser.add_argument('--max-batch', type=int, default=64, help='the most requests run in one batch')
+  serve_parser.add_argument('--max-delay', type=float, default=2.0, help='the milliseconds a request may wait for a batch')
+  serve_parser.set_defaults(run=serve_command)
+  args = parser.parse_args(argv)
+  if args.command is None:
+    parser.print_help()
+    return 2
+  try:
+    return args.run(args)
+  except Exception as e:
+    print('pype: %s' % e, file=sys.stderr)
+    return 1
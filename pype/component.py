@@ -0,0 +1,162 @@
+import functools
+import itertools
+import numbers
+import threading
+
+ATTRIB_COMPONENT = '_pype_component'
+
+# Optional attributes of a component, with their defaults:
+#   threadsafe: components are treated as thread-safe unless marked
+#     threadsafe=False; those never run concurrently with another component
+#     marked so
+#   vectorized: a kernel computing the function for many series at once, for
+#     batched execution; it receives series as 2-D arrays with one row per
+#     series, and returns a 2-D array for series or 1-D for scalars
+#   accumulator: a factory of objects with update(chunk) and result() methods,
+#     computing a reduction online, for streaming execution
+#   returns: the type of the value returned, for type inference; numbers.Real
+#     for scalars. A return annotation is used if this is not given.
+COMPONENT_ATTRIBUTES = {
+  'threadsafe': True,
+  'vectorized': None,
+  'accumulator': None,
+  'returns': None,
+}
+
+# Components declared with @component, indexed by where they were declared:
+# {(module name, owner class qualname or '') => {name => function}}. Importing
+# a library into a program looks its components up here instead of reflecting
+# over the module. The generation changes with every declaration, so that
+# indexes built from it know when they are stale.
+_declared = {}
+_declared_lock = threading.Lock()
+_generation = 0
+
+def _declare(func):
+  global _generation
+  module = getattr(func, '__module__', None)
+  qualname = getattr(func, '__qualname__', None) or getattr(func, '__name__', '')
+  owner, _, name = qualname.rpartition('.')
+  with _declared_lock:
+    _declared.setdefault((module, owner), {})[name] = func
+    _generation += 1
+
+def declared_components(module, owner=''):
+  'Returns the components declared with @component in a module, or in a class of it, by name.'
+  return _declared.get((module, owner), {})
+
+def declaration_generation():
+  'Returns a number which changes whenever a component is declared.'
+  return _generation
+
+def declaring_modules():
+  'Returns the names of the modules which declared components or kernels.'
+  modules = set(module for (module,_) in _declared)
+  modules.update(getattr(func, '__module__', None) for (func,_) in list(_kernels.values()))
+  modules.discard(None)
+  return modules
+
+def component(func=None, **attributes):
+  '''Marks a function as compatible for exposing as a component in PyPE.
+  Used either bare, as @component, or with attributes, as
+  @component(threadsafe=False).'''
+  if func is None:
+    return functools.partial(component, **attributes)
+  for name in attributes:
+    if name not in COMPONENT_ATTRIBUTES:
+      raise TypeError("Unknown component attribute '%s'"%name)
+  func._attributes = {}
+  func._attributes['_pype_component'] = True
+  for (name,default) in COMPONENT_ATTRIBUTES.items():
+    func._attributes['_pype_'+name] = attributes.get(name, default)
+  _declare(func)
+  return func
+
+def is_component(func):
+  'Checks whether the @component decorator was applied to a function.'
+  try:
+    if func._attributes['_pype_component']: return True
+    else: return False
+  except:
+    return False
+
+def component_attribute(func, name):
+  'Returns an attribute given to @component, or its default.'
+  try:
+    return func._attributes['_pype_'+name]
+  except:
+    return COMPONENT_ATTRIBUTES[name]
+
+def is_threadsafe(func):
+  'Checks whether a function may run concurrently with others; anything not marked otherwise is.'
+  return bool(component_attribute(func, 'threadsafe'))
+
+def vectorized_kernel(func):
+  'Returns the batched kernel of a component, or None if it has none.'
+  return component_attribute(func, 'vectorized')
+
+def return_type(func):
+  'Returns the declared type of the value a component returns, or None.'
+  declared = component_attribute(func, 'returns')
+  if declared is None:
+    declared = getattr(func, '__annotations__', {}).get('return')
+  return declared if isinstance(declared, type) else None
+
+# Specialized kernels of the arithmetic operators, by operator and operand
+# types: {(operator, type, ...) => (kernel, result type)}. Kernels know the
+# kind of their operands, so they skip the runtime dispatch of the generic
+# operator, which the compiler replaces with them when it can infer the types.
+_kernels = {}
+_kernel_operators = {} # {kernel => operator}
+_kernels_with_out = set() # Kernels which can write their result into a dead value
+
+def kernel(op, *types, **options):
+  '''Declares a function as the implementation of an arithmetic operator of
+  the operator module (operator.add, ...) for operands of the given types,
+  numbers.Real standing for scalars. The result has the type given as returns,
+  by default the first operand type which is not a scalar. With out=True, the
+  kernel also takes an out= keyword: a value of the result type which is no
+  longer needed, to reuse the memory of if its shape and dtype fit; it returns
+  either out or a new value.'''
+  returns = options.pop('returns', None)
+  out = options.pop('out', False)
+  if options:
+    raise TypeError("Unknown kernel option '%s'" % sorted(options)[0])
+  if returns is None:
+    returns = next((t for t in types if t is not numbers.Real), numbers.Real)
+  def declare(func):
+    _kernels[(op,)+tuple(types)] = (func, returns)
+    _kernel_operators[func] = op
+    if out:
+      _kernels_with_out.add(func)
+    return func
+  return declare
+
+def find_kernel(op, types):
+  '''Returns the (kernel, result type) of an operator for operands of the
+  given types, following their base classes, or None.'''
+  def candidates(t):
+    return t.__mro__ if isinstance(t, type) else ()
+  for key in itertools.product(*[candidates(t) for t in types]):
+    found = _kernels.get((op,)+key)
+    if found is not None:
+      return found
+  return None
+
+def has_kernels(op, t):
+  'Checks whether kernels of an operator were declared for operands of a type.'
+  return any(key[0] == op and any(issubclass(t, k) for k in key[1:]) for key in _kernels)
+
+def generic_operator(func):
+  'Returns the operator a kernel implements, or func itself.'
+  try:
+    return _kernel_operators.get(func, func)
+  except TypeError: # Unhashable
+    return func
+
+def accepts_out(func):
+  'Checks whether a kernel takes an out= buffer to reuse.'
+  try:
+    return func in _kernels_with_out
+  except TypeError: # Unhashable
+    return False
@@ -0,0 +1,117 @@
+import concurrent.futures
+import os
+import threading
+import weakref
+
+from .lib_import import is_threadsafe
+
+# Held while running any component marked @component(threadsafe=False)
+_unsafe_lock = threading.RLock()
+
+def _run_unsafe(func, *args):
+  with _unsafe_lock:
+    return func(*args)
+
+class ParallelExecutor(object):
+  """
+    A class that takes a PCode and runs it with independent instructions
+    scheduled concurrently on a thread pool; numpy releases the GIL in most of
+    its numeric kernels, so independent reductions like (mean t) and (std t)
+    overlap
+
+    Parameters
+    ----------
+    pcode: the PCode of a component
+    workers: the number of threads, by default the number of CPUs
+
+    Returns
+    -------
+    __call__(*args): value
+        returns the same value as pcode(*args); if instructions fail, the
+        exception of the first failing one in program order is raised
+    shutdown(): None
+        stops the thread pool; the executor can also be used as a context
+        manager, and its pool is stopped when it is garbage collected
+
+    Examples
+    --------
+    >>> import operator
+    >>> from .pcode import PCode, Instruction
+    >>> p = PCode('c', ['x'], ['z'], {}, [Instruction('a', operator.neg, ('x',)),
+    ...                                  Instruction('b', abs, ('x',)),
+    ...                                  Instruction('z', operator.add, ('a','b'))])
+    >>> with ParallelExecutor(p, workers=2) as run:
+    ...     run(-3)
+    6
+  """
+  def __init__(self, pcode, workers=None):
+    self.pcode = pcode
+    self.workers = workers or os.cpu_count() or 1
+    self._pool = None
+    self._finalizer = None
+    # Dependencies between instructions, computed once
+    producer = {ins.dest:i for (i,ins) in enumerate(pcode.instructions)}
+    self._deps = [set(producer[a] for a in ins.args if a in producer) for ins in pcode.instructions]
+    self._consumers = [[] for ins in pcode.instructions]
+    for (i,deps) in enumerate(self._deps):
+      for d in deps:
+        self._consumers[d].append(i)
+    self._calls = [(ins.func,) if is_threadsafe(ins.func) else (_run_unsafe, ins.func) for ins in pcode.instructions]
+
+  def __repr__(self):
+    return '<ParallelExecutor %s(%s), workers=%d>' % (self.pcode.name, ', '.join(self.pcode.inputs), self.workers)
+
+  def __enter__(self):
+    return self
+  def __exit__(self, *exc):
+    self.shutdown()
+
+  def shutdown(self):
+    if self._pool is not None:
+      self._finalizer.detach()
+      self._pool.shutdown()
+      self._pool = None
+
+  def __call__(self, *args):
+    pcode = self.pcode
+    if self.workers == 1:
+      return pcode(*args)
+    if len(args) != len(pcode.inputs):
+      raise TypeError('%s() takes %d input(s) but %d were given' % (pcode.name, len(pcode.inputs), len(args)))
+    if self._pool is None:
+      self._pool = concurrent.futures.ThreadPoolExecutor(self.workers)
+      # Executors which are never shut down must not leak their threads
+      self._finalizer = weakref.finalize(self, self._pool.shutdown, False)
+    env = pcode.constants.copy()
+    env.update(zip(pcode.inputs, args))
+    waiting = [len(deps) for deps in self._deps]
+    running = {}
+    errors = {}
+    def submit(i):
+      ins = pcode.instructions[i]
+      call = self._calls[i]+tuple(env[a] for a in ins.args)
+      running[self._pool.submit(*call)] = i
+    for (i,n) in enumerate(waiting):
+      if n == 0:
+        submit(i)
+    while running:
+      done,_ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+      for future in done:
+        i = running.pop(future)
+        try:
+          env[pcode.instructions[i].dest] = future.result()
+        except Exception as e:
+          errors[i] = e
+          continue
+        if errors:
+          # Let what is running finish, but start nothing new
+          continue
+        for c in self._consumers[i]:
+          waiting[c] -= 1
+          if waiting[c] == 0:
+            submit(c)
+    if errors:
+      raise errors[min(errors)]
+    if len(pcode.outputs) == 1:
+      return env[pcode.outputs[0]]
+    return tuple(env[o] for o in pcode.outputs)
@@ -0,0 +1,176 @@
+import collections
+import enum
+import heapq
+
+FGNodeType = enum.Enum('FGNodeType', 'input output assignment literal operator libraryfunction librarymethod component')
+
+class FGNode(object):
+  """
+    A class that takes an id, a node type and a reference as its arguments
+    and defines a node of a dataflow graph
+
+    Parameters
+    ----------
+    nodeid: a string unique within its flowgraph
+    nodetype: a FGNodeType
+    ref: the variable name, literal value or function the node stands for
+    inputs: a list of the node ids whose values flow into this node, in argument order
+
+    Examples
+    --------
+    >>> n = FGNode('@0', FGNodeType.input, 't')
+    >>> n
+    FGNode(@0, input, 't', [])
+  """
+  def __init__(self, nodeid, nodetype, ref=None, inputs=None):
+    self.nodeid = nodeid
+    self.type = nodetype
+    self.ref = ref
+    self.inputs = list(inputs) if inputs else []
+    self.position = None # (line, column) of the expression of a function node
+
+  def __repr__(self):
+    ref = getattr(self.ref, '__qualname__', None) or repr(self.ref)
+    return 'FGNode(%s, %s, %s, [%s])' % (self.nodeid, self.type.name, ref, ', '.join(self.inputs))
+
+class Flowgraph(object):
+  """
+    A class that takes the name of a component as its argument and defines the
+    dataflow graph of that component, from its inputs to its outputs
+
+    Parameters
+    ----------
+    name: a string representing the name of the component
+
+    Returns
+    -------
+    new_node(nodetype, ref, inputs): FGNode
+        returns a new node which has been added to the graph
+    pre(nodeid): list
+        returns the ids of the nodes flowing into nodeid
+    post(nodeid): list
+        returns the ids of the nodes nodeid flows into
+    topological_sort(): list
+        returns every node id, each one after all of its inputs
+    dotfile(): string
+        returns a graphviz representation of the graph
+
+    Examples
+    --------
+    >>> fg = Flowgraph('c')
+    >>> x = fg.new_node(FGNodeType.input, 'x')
+    >>> y = fg.new_node(FGNodeType.output, 'y', [x.nodeid])
+    >>> fg.inputs, fg.outputs
+    (['@0'], ['@1'])
+    >>> fg.topological_sort()
+    ['@0', '@1']
+    >>> fg.post('@0')
+    ['@1']
+  """
+  def __init__(self, name):
+    self.name = name
+    self.nodes = collections.OrderedDict()
+    self.inputs = []
+    self.outputs = []
+    self.variables = collections.OrderedDict() # {name:str => nodeid}
+    self._counter = 0
+
+  def new_node(self, nodetype, ref=None, inputs=None):
+    node = FGNode('@%d' % self._counter, nodetype, ref, inputs)
+    self._counter += 1
+    self.nodes[node.nodeid] = node
+    if nodetype == FGNodeType.input:
+      self.inputs.append(node.nodeid)
+    elif nodetype == FGNodeType.output:
+      self.outputs.append(node.nodeid)
+    return node
+
+  def remove_node(self, nodeid):
+    self.remove_nodes([nodeid])
+
+  def remove_nodes(self, nodeids):
+    'Removes many nodes, and the variables bound to them, in one pass.'
+    removed = set(nodeids)
+    for nodeid in removed:
+      del self.nodes[nodeid]
+    for name in [name for (name,v) in self.variables.items() if v in removed]:
+      del self.variables[name]
+
+  def pre(self, nodeid):
+    return self.nodes[nodeid].inputs
+
+  def post(self, nodeid):
+    return [i for (i,n) in self.nodes.items() if nodeid in n.inputs]
+
+  def topological_sort(self):
+    '''Kahn's algorithm; ties are broken by creation order so that the result
+    is deterministic.'''
+    order = {nodeid:i for (i,nodeid) in enumerate(self.nodes)}
+    indegree = {nodeid:len(set(n.inputs)) for (nodeid,n) in self.nodes.items()}
+    consumers = collections.defaultdict(set)
+    for (nodeid,n) in self.nodes.items():
+      for i in n.inputs:
+        consumers[i].add(nodeid)
+    ready = [(order[i],i) for (i,d) in indegree.items() if d==0]
+    heapq.heapify(ready)
+    result = []
+    while ready:
+      _,nodeid = heapq.heappop(ready)
+      result.append(nodeid)
+      for c in consumers[nodeid]:
+        indegree[c] -= 1
+        if indegree[c] == 0:
+          heapq.heappush(ready, (order[c],c))
+    if len(result) != len(self.nodes):
+      cycle = sorted(self.nodes[i].ref for (i,d) in indegree.items() if d>0 and self.nodes[i].type==FGNodeType.assignment)
+      raise SyntaxError("Circular definition of %s in component '%s'"%(', '.join("'%s'"%c for c in cycle),self.name))
+    return result
+
+  def pprint(self):
+    lines = [self.name]
+    for nodeid in self.topological_sort():
+      lines.append('  '+repr(self.nodes[nodeid]))
+    return '\n'.join(lines)
+
+  def dotfile(self):
+    lines = ['digraph %s {' % self.name]
+    for (nodeid,n) in self.nodes.items():
+      label = getattr(n.ref, '__name__', None) or str(n.ref)
+      lines.append('  "%s" [label="%s\\n%s"]' % (nodeid, n.type.name, label.replace('"','\\"')))
+    for (nodeid,n) in self.nodes.items():
+      for i in n.inputs:
+        lines.append('  "%s" -> "%s"' % (i, nodeid))
+    lines.append('}')
+    return '\n'.join(lines)
+
+class FGIR(object):
+  """
+    A class that defines the intermediate representation of a whole program,
+    as a dictionary from component names to their flowgraphs
+
+    Examples
+    --------
+    >>> ir = FGIR()
+    >>> ir['c'] = Flowgraph('c')
+    >>> list(ir)
+    ['c']
+  """
+  def __init__(self):
+    self.graphs = collections.OrderedDict()
+
+  def __getitem__(self, component):
+    return self.graphs[component]
+  def __setitem__(self, component, value):
+    self.graphs[component] = value
+  def __iter__(self):
+    return iter(self.graphs)
+  def __len__(self):
+    return len(self.graphs)
+
+  def flowgraph_pass(self, flowgraph_optimizer):
+    for (name,graph) in self.graphs.items():
+      self.graphs[name] = flowgraph_optimizer.visit(graph)
+    return flowgraph_optimizer
+
+  def pprint(self):
+    return '\n'.join(graph.pprint() for graph in self.graphs.values())
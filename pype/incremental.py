@@ -0,0 +1,124 @@
+import collections
+import re
+
+from .lexer import reserved
+
+IMPORT = 'import'
+COMPONENT = 'component'
+
+# A top-level statement of a program, as written: kind is IMPORT or COMPONENT,
+# name the module or component name, and calls the names the component calls
+Statement = collections.namedtuple('Statement','kind name text start calls')
+
+NAME_RE = re.compile(r'[\{\(]\s*(?:import\s+)?([a-zA-Z_][a-zA-Z_0-9]*)')
+CALL_RE = re.compile(r'\(\s*([a-zA-Z_][a-zA-Z_0-9]*)')
+
+def _skip(source, i):
+  'Returns the end of a comment or string starting at i, or None.'
+  if source[i] == '#':
+    end = source.find('\n', i)
+    return len(source) if end < 0 else end
+  if source[i] == '"':
+    # Strings run to the last quote on their line, as in the lexer
+    end = source.find('\n', i)
+    end = len(source) if end < 0 else end
+    last = source.rfind('"', i+1, end)
+    return end if last < 0 else last+1
+  return None
+
+def split_statements(source):
+  '''Splits a program into its top-level statements without parsing it, by
+  matching brackets. Returns None if the brackets do not balance: such a
+  program needs a full compilation to report its errors.
+
+  >>> [(s.kind, s.name, s.calls) for s in split_statements('(import timeseries) { c (input t) (:= m (mean t)) (output m) }')]
+  [('import', 'timeseries', frozenset()), ('component', 'c', frozenset({'mean'}))]
+  '''
+  statements = []
+  depth = 0
+  start = None
+  i = 0
+  while i < len(source):
+    c = source[i]
+    end = _skip(source, i)
+    if end is not None:
+      i = end
+      continue
+    if c in '({':
+      if depth == 0:
+        start = i
+      depth += 1
+    elif c in ')}':
+      depth -= 1
+      if depth < 0:
+        return None
+      if depth == 0:
+        statements.append(_statement(source[start:i+1], start))
+    elif depth == 0 and not c.isspace():
+      return None
+    i += 1
+  if depth != 0:
+    return None
+  return statements
+
+def _statement(text, start):
+  m = NAME_RE.match(text)
+  name = m.group(1) if m else None
+  if text[0] == '(':
+    return Statement(IMPORT, name, text, start, frozenset())
+  calls = frozenset(CALL_RE.findall(text)) - set(reserved)
+  return Statement(COMPONENT, name, text, start, calls)
+
+def changed_components(old, new):
+  '''Returns the names of the components of the new statements which must be
+  recompiled: those whose source changed, and those calling a changed or
+  removed component. Returns None if everything must be recompiled, because
+  the imports changed or a component name cannot be told apart.'''
+  def imports(statements):
+    return [s.text for s in statements if s.kind == IMPORT]
+  def components(statements):
+    return collections.OrderedDict((s.name, s) for s in statements if s.kind == COMPONENT)
+  if imports(old) != imports(new):
+    return None
+  before, after = components(old), components(new)
+  if None in after or len(after) != len([s for s in new if s.kind == COMPONENT]):
+    return None
+  changed = set(name for (name,s) in after.items() if name not in before or before[name].text != s.text)
+  removed = set(before) - set(after)
+  # Dependents, transitively
+  stale = changed | removed
+  while True:
+    dependents = set(name for (name,s) in after.items() if name not in changed and s.calls & stale)
+    if not dependents:
+      break
+    changed |= dependents
+    stale |= dependents
+  return [name for name in after if name in changed]
+
+def with_callees(statements, names):
+  '''Returns the names, and the names of the components they call,
+  transitively: compiling a component needs the components it inlines.'''
+  calls = dict((s.name, s.calls) for s in statements if s.kind == COMPONENT)
+  result = set(names)
+  stack = list(names)
+  while stack:
+    for name in calls.get(stack.pop(), ()):
+      if name in calls and name not in result:
+        result.add(name)
+        stack.append(name)
+  return result
+
+def blank_except(source, statements, keep):
+  '''Returns the source with every statement but the imports and the
+  components named in keep replaced by blank lines, so that line numbers in
+  error messages stay those of the full source.'''
+  pieces = []
+  pos = 0
+  for s in statements:
+    pieces.append('\n'*source.count('\n', pos, s.start))
+    if s.kind == IMPORT or s.name in keep:
+      pieces.append(s.text)
+    else:
+      pieces.append('\n'*s.text.count('\n'))
+    pos = s.start+len(s.text)
+  return ''.join(pieces)
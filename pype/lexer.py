@@ -1,3 +1,5 @@
+import threading
+
 import ply.lex
 
 reserved = { # pattern : token-name
@@ -52,18 +54,50 @@ def t_newline(t):
     r'\n+'
     t.lexer.lineno += len(t.value)
 
-# Error-handling routine, which prints line and column numbers
+# Error-handling routine, which reports line and column numbers
 def t_error(t):
-    print("Illegal character '%s' at line %d, column %d" % (t.value[0], t.lexer.lineno, find_column(t.lexer.lexdata, t)))
+    report(t.lexer, "Illegal character '%s' at line %d, column %d" % (t.value[0], t.lexer.lineno, find_column(t.lexer.lexdata, t)))
     t.lexer.skip(1)
 
+def report(lexer, message):
+    'Errors are collected by the lexers of compilations, and printed otherwise.'
+    errors = getattr(lexer, 'errors', None)
+    if errors is None:
+        print(message)
+    else:
+        errors.append(message)
+
 def find_column(input,token):
+    # Columns are counted from 1 on every line: rfind is -1 on the first
     last_cr = input.rfind('\n',0,token.lexpos)
-    if last_cr < 0:
-        last_cr = 0
-    column = (token.lexpos - last_cr) 
+    column = (token.lexpos - last_cr)
     return column
 
-# # This actually builds the lexer.
-lexer = ply.lex.lex()
+# The lexer is built on first use rather than at import, so that importing
+# pype costs nothing until something is compiled.
+_lexer = None
+_lock = threading.Lock()
+
+def get_lexer():
+  'Returns the shared lexer, building it on first use.'
+  global _lexer
+  with _lock:
+    if _lexer is None:
+      # Not optimized: PLY would then write a lextab module at runtime
+      _lexer = ply.lex.lex()
+  return _lexer
+
+def new_lexer():
+  '''Returns a lexer of its own, with fresh state, for one compilation; the
+  compiled rules are shared with the shared lexer. It collects its errors in
+  lexer.errors instead of printing them.'''
+  lexer = get_lexer().clone()
+  lexer.lineno = 1
+  lexer.errors = []
+  return lexer
+
+def __getattr__(name):
+  if name == 'lexer':
+    return get_lexer()
+  raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
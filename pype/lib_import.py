@@ -1,45 +1,107 @@
 import importlib
-import inspect
-import functools
+import threading
 
 from .symtab import *
+from .component import *
 
-ATTRIB_COMPONENT = '_pype_component'
+class ComponentIndex(object):
+  """
+    A class that takes an imported module and indexes the PyPE components it
+    exposes, by name and by owner class; it is built from the components
+    declared with @component rather than by reflecting over every member
 
-def component(func):
-  'Marks a function as compatible for exposing as a component in PyPE.'
-  func._attributes = {}
-  func._attributes['_pype_component'] = True
-  return func
+    Parameters
+    ----------
+    mod: a module object
 
-def is_component(func):
-  'Checks whether the @component decorator was applied to a function.'
-  try:
-    if func._attributes['_pype_component']: return True
-    else: return False
-  except:
-    return False
+    Returns
+    -------
+    functions: dictionary
+        the components which are module-level functions, by name
+    methods: dictionary
+        the components which are methods, by class name, then by name
+    lookup(name): Symbol
+        returns the symbol a program refers to by name, or None; functions
+        take precedence over methods of the same name
+
+    Examples
+    --------
+    >>> import timeseries
+    >>> index = ComponentIndex(timeseries)
+    >>> sorted(index.methods['TimeSeries'])
+    ['mean', 'std']
+    >>> index.lookup('mean').type
+    <SymbolType.librarymethod: 6>
+    >>> index.lookup('median') is None
+    True
+  """
+  def __init__(self, mod):
+    self.mod = mod
+    self.generation = declaration_generation()
+    self.functions = {}
+    self.methods = {}
+    for (name,obj) in list(vars(mod).items()):
+      if isinstance(obj, type):
+        self._index_class(name, obj)
+      elif callable(obj) and is_component(obj):
+        self.functions[name] = obj
+    self.symbols = {}
+    for (owner,methods) in self.methods.items():
+      for (name,method) in methods.items():
+        self.symbols.setdefault(name, Symbol(name, SymbolType.librarymethod, method))
+    for (name,func) in self.functions.items():
+      self.symbols[name] = Symbol(name, SymbolType.libraryfunction, func)
+
+  def _index_class(self, name, cls):
+    methods = {}
+    # Inherited components too, unless overridden by something else
+    for base in reversed(cls.__mro__):
+      for methodname in declared_components(base.__module__, base.__qualname__):
+        method = getattr(cls, methodname, None)
+        if method is not None and is_component(method):
+          methods[methodname] = method
+    if methods:
+      self.methods[name] = methods
+
+  def lookup(self, name):
+    return self.symbols.get(name)
+
+# {module name => ComponentIndex}, shared by every compilation
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def component_index(modname):
+  '''Returns the index of the components of a module, importing it and
+  building the index on first use; the index is rebuilt if the module was
+  reloaded or components were declared since.'''
+  mod = importlib.import_module(modname)
+  index = _indexes.get(modname)
+  if index is None or index.mod is not mod or index.generation != declaration_generation():
+    with _indexes_lock:
+      index = ComponentIndex(mod)
+      _indexes[modname] = index
+  return index
 
 class LibraryImporter(object):
   def __init__(self, modname=None):
     self.mod = None
+    self.index = None
     if modname is not None:
       self.import_module(modname)
 
   def import_module(self, modname):
-    self.mod = importlib.import_module(modname)
-
-  def add_symbols(self, symtab):
-    assert self.mod is not None, 'No module specified or loaded'
+    self.index = component_index(modname)
+    self.mod = self.index.mod
 
-    for (name,obj) in inspect.getmembers(self.mod):
+  def lookup(self, name):
+    'Returns the symbol of one component of the module, or None.'
+    assert self.index is not None, 'No module specified or loaded'
+    return self.index.lookup(name)
 
-      if inspect.isroutine(obj) and is_component(obj):
-        symtab.addsym( Symbol(name, SymbolType.libraryfunction, obj) )
+  def add_symbols(self, symtab):
+    assert self.index is not None, 'No module specified or loaded'
 
-      elif inspect.isclass(obj):
-        for (methodname,method) in inspect.getmembers(obj):
-          if inspect.isroutine(method) and is_component(method):
-            symtab.addsym( Symbol(methodname, SymbolType.librarymethod, method) )
+    for symbol in self.index.symbols.values():
+      symtab.addsym(symbol)
 
     return symtab
@@ -0,0 +1,155 @@
+import collections
+import hashlib
+import inspect
+import numbers
+import threading
+
+from .cache import CompileCache
+
+def fingerprint(value):
+  '''Returns a string identifying the contents of an input, or None if it has
+  none. Series provide their own, cached, through a fingerprint() method;
+  scalars and strings are identified by their value, numpy arrays by a hash of
+  their buffer.'''
+  method = getattr(value, 'fingerprint', None)
+  if callable(method):
+    return method()
+  if value is None or isinstance(value, (numbers.Number, str, bytes)):
+    return repr((type(value).__name__, value))
+  if hasattr(value, 'dtype') and hasattr(value, 'tobytes') and not value.dtype.hasobject:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((value.dtype.str, value.shape)).encode())
+    h.update(value.tobytes())
+    return 'array:'+h.hexdigest()
+  return None
+
+def _name(func):
+  return '%s.%s' % (getattr(func, '__module__', None), getattr(func, '__qualname__', repr(func)))
+
+def _code(func):
+  '''Returns what identifies the implementation of a function: its source,
+  or else its bytecode and constants, so that results memoized on disk are not
+  returned after it changed.'''
+  func = inspect.unwrap(func)
+  try:
+    return inspect.getsource(func)
+  except (TypeError, OSError):
+    pass
+  code = getattr(func, '__code__', None)
+  if code is not None:
+    return repr((code.co_code, code.co_consts))
+  return None # Builtins, like the operators, change with Python only
+
+def code_fingerprint(pcode):
+  'Returns a hash of what a PCode computes, so that memos of different code never mix.'
+  code = (pcode.name, pcode.inputs, pcode.outputs, sorted((k,repr(v)) for (k,v) in pcode.constants.items()),
+          [(dest, _name(func), _code(func), args) for (dest,func,args) in pcode.instructions])
+  return hashlib.sha256(repr(code).encode()).hexdigest()
+
+class Memo(object):
+  """
+    A class that takes a PCode and memoizes its results by the fingerprints of
+    its inputs: repeated calls with unchanged inputs return the cached outputs
+    instead of running the component again. Results are kept in a bounded LRU
+    in memory and, optionally, on disk.
+
+    Cached outputs are shared between the calls returning them, and must not be
+    modified.
+
+    Parameters
+    ----------
+    pcode: the PCode of a component
+    max_entries: the number of results kept in memory
+    directory: a directory for the on-disk tier, shared between processes and
+        runs, or None for memory only
+    max_size: the maximum size of the on-disk tier, in bytes
+
+    Returns
+    -------
+    __call__(*args): value
+        returns the same value as pcode(*args)
+    hits, disk_hits, misses, bypassed: int
+        counts of calls answered from memory, answered from disk, computed, and
+        computed without memoization because an input has no fingerprint
+    hit_rate(): float
+        returns the fraction of memoizable calls answered from a cache
+    clear(): None
+        empties both tiers
+
+    Examples
+    --------
+    >>> import operator
+    >>> from .pcode import PCode, Instruction
+    >>> p = PCode('c', ['x'], ['y'], {}, [Instruction('y', operator.neg, ('x',))])
+    >>> run = Memo(p, max_entries=2)
+    >>> run(1), run(1), run(2)
+    (-1, -1, -2)
+    >>> run
+    <Memo c, hits=1, disk_hits=0, misses=2, bypassed=0, entries=2/2>
+  """
+  def __init__(self, pcode, max_entries=1024, directory=None, max_size=256*1024*1024):
+    self.pcode = pcode
+    self.max_entries = max_entries
+    self.disk = CompileCache(directory, max_size) if directory is not None else None
+    self.hits = 0
+    self.disk_hits = 0
+    self.misses = 0
+    self.bypassed = 0
+    self._code = code_fingerprint(pcode)
+    self._entries = collections.OrderedDict() # {key => outputs}, least recently used first
+    self._lock = threading.Lock()
+
+  def __repr__(self):
+    return '<Memo %s, hits=%d, disk_hits=%d, misses=%d, bypassed=%d, entries=%d/%d>' % (
+      self.pcode.name, self.hits, self.disk_hits, self.misses, self.bypassed, len(self._entries), self.max_entries)
+
+  def hit_rate(self):
+    total = self.hits+self.disk_hits+self.misses
+    return (self.hits+self.disk_hits)/total if total else 0.0
+
+  def key(self, args):
+    'Returns the key of a call, or None if an input has no fingerprint.'
+    prints = [fingerprint(a) for a in args]
+    if None in prints:
+      return None
+    return hashlib.sha256(repr((self._code, prints)).encode()).hexdigest()
+
+  def __call__(self, *args):
+    if len(args) != len(self.pcode.inputs):
+      raise TypeError('%s() takes %d input(s) but %d were given' % (self.pcode.name, len(self.pcode.inputs), len(args)))
+    key = self.key(args)
+    if key is None:
+      with self._lock:
+        self.bypassed += 1
+      return self.pcode(*args)
+    with self._lock:
+      if key in self._entries:
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._entries[key]
+    result = self.disk.load(key) if self.disk is not None else None
+    if result is not None:
+      with self._lock:
+        self.disk_hits += 1
+        self._remember(key, result[0])
+      return result[0]
+    value = self.pcode(*args)
+    with self._lock:
+      self.misses += 1
+      self._remember(key, value)
+    if self.disk is not None:
+      # Wrapped, so that a cached None is told apart from a miss
+      self.disk.store(key, (value,))
+    return value
+
+  def _remember(self, key, value):
+    self._entries[key] = value
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.max_entries:
+      self._entries.popitem(last=False)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+    if self.disk is not None:
+      self.disk.clear()
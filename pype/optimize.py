@@ -0,0 +1,351 @@
+import collections
+import functools
+import itertools
+import numbers
+
+from .ast import *
+from .fgir import *
+from .translate import OPERATORS
+
+SYMBOLS = {'__add__':'+', '__sub__':'-', '__mul__':'*', '__truediv__':'/'}
+
+def sexpr(node):
+  'Renders an expression AST back to PyPE source, for reports.'
+  # An explicit stack of nodes and of text, for expressions of any depth
+  parts = []
+  stack = [node]
+  while stack:
+    item = stack.pop()
+    if isinstance(item, str):
+      parts.append(item)
+    elif isinstance(item, ASTID):
+      parts.append(item.name)
+    elif isinstance(item, ASTLiteral):
+      parts.append(str(item.value))
+    elif isinstance(item, ASTEvalExpr):
+      stack.append(')')
+      for arg in reversed(item.args):
+        stack.extend([arg, ' '])
+      stack.append('('+SYMBOLS.get(item.op.name, item.op.name))
+    else:
+      parts.append(item.__class__.__name__)
+  return ''.join(parts)
+
+def _replace_children(node, child_values):
+  if any(new is not old for (new,old) in zip(child_values, node.children)):
+    node.children = child_values
+
+def _attached(node, root):
+  'Checks whether node is still part of the tree under root.'
+  while node is not root:
+    if node.parent is None or not any(c is node for c in node.parent.children):
+      return False
+    node = node.parent
+  return True
+
+class ConstantFolding(ASTModVisitor):
+  """
+    A visitor which pre-evaluates arithmetic whose operands are all numeric
+    literals, replacing the expression with an ASTLiteral
+
+    Examples
+    --------
+    >>> e = ASTEvalExpr(ASTID('__mul__'), [ASTLiteral(2), ASTEvalExpr(ASTID('__add__'), [ASTLiteral(1), ASTLiteral(2)])])
+    >>> folder = ConstantFolding()
+    >>> c = ASTComponent('c', [ASTAssignmentExpr('x', e)]).mod_walk(folder)
+    >>> c.expressions[0].value.value
+    6
+    >>> folder.changes
+    [('c', 'folded (+ 1 2) to 3'), ('c', 'folded (* 2 3) to 6')]
+  """
+  def __init__(self):
+    self.changes = []
+    self._component = None
+
+  def visit(self, node):
+    if isinstance(node, ASTComponent):
+      self._component = node.name
+    return node
+
+  def post_visit(self, node, visit_value, child_values):
+    _replace_children(node, child_values)
+    if isinstance(node, ASTEvalExpr) and node.op.name in OPERATORS:
+      values = [arg.value for arg in node.args if isinstance(arg, ASTLiteral)]
+      if len(values) == len(node.args) and all(isinstance(v, numbers.Number) for v in values):
+        try:
+          value = self._evaluate(node.op.name, values)
+        except (ZeroDivisionError, SyntaxError):
+          # Leave it for the runtime (or the lowering) to report
+          return node
+        self.changes.append((self._component, 'folded %s to %s' % (sexpr(node), value)))
+        return ASTLiteral(value)
+    return node
+
+  def _evaluate(self, opname, values):
+    # Same semantics as the lowering: (- x) negates, (+ a b c) folds left.
+    if len(values) == 1 and opname == '__sub__':
+      return -values[0]
+    if len(values) == 1 and opname == '__add__':
+      return values[0]
+    if len(values) < 2:
+      raise SyntaxError(opname)
+    return functools.reduce(OPERATORS[opname], values)
+
+class CommonSubexpressionElimination(ASTModVisitor):
+  """
+    A visitor which computes structurally identical ASTEvalExpr subtrees of a
+    component only once: repeated occurrences are replaced by a reference to
+    an existing binding of the expression, or to a new one
+
+    Examples
+    --------
+    >>> mean = lambda: ASTEvalExpr(ASTID('mean'), [ASTID('t')])
+    >>> c = ASTComponent('c', [ASTAssignmentExpr('a', ASTEvalExpr(ASTID('__sub__'), [ASTID('t'), mean()])),
+    ...                        ASTAssignmentExpr('b', ASTEvalExpr(ASTID('__add__'), [ASTID('t'), mean()]))])
+    >>> cse = CommonSubexpressionElimination()
+    >>> c = c.mod_walk(cse)
+    >>> [(e.binding.name, sexpr(e.value)) for e in c.expressions]
+    [('a', '(- t _cse0)'), ('b', '(+ t _cse0)'), ('_cse0', '(mean t)')]
+    >>> cse.changes
+    [('c', "bound (mean t) to '_cse0' for 2 uses")]
+  """
+  def __init__(self):
+    self.changes = []
+    self._keys = {} # {id(node) => (key, size)}
+    self._interned = {} # {structure => key}: keys are small ints, however deep the expression
+    self._occurrences = None
+
+  def visit(self, node):
+    if isinstance(node, ASTComponent):
+      self._occurrences = collections.OrderedDict() # {key => [ASTEvalExpr]}
+    return node
+
+  def post_visit(self, node, visit_value, child_values):
+    _replace_children(node, child_values)
+    if isinstance(node, ASTID):
+      self._keys[id(node)] = (self._intern(('id', node.name)), 1)
+    elif isinstance(node, ASTLiteral):
+      self._keys[id(node)] = (self._intern(('literal', type(node.value).__name__, node.value)), 1)
+    elif isinstance(node, ASTEvalExpr) and self._occurrences is not None:
+      children = [self._keys[id(child)] for child in node.children]
+      key = self._intern(tuple(k for (k,_) in children))
+      self._keys[id(node)] = (key, 1+sum(size for (_,size) in children))
+      self._occurrences.setdefault(key, []).append(node)
+    elif isinstance(node, ASTComponent):
+      self._eliminate(node)
+      self._occurrences = None
+    return node
+
+  def _intern(self, structure):
+    return self._interned.setdefault(structure, len(self._interned))
+
+  def _eliminate(self, component):
+    names = set(e.binding.name for e in component.expressions if isinstance(e, ASTAssignmentExpr))
+    for e in component.expressions:
+      if isinstance(e, (ASTInputExpr, ASTOutputExpr)):
+        names.update(child.name for child in e.children)
+    new_bindings = []
+    # Largest subtrees first, so that repeats nested inside a replaced
+    # subtree are not counted twice.
+    keys = sorted(self._occurrences, key=lambda k: -self._keys[id(self._occurrences[k][0])][1])
+    for key in keys:
+      if len(self._occurrences[key]) < 2:
+        continue
+      occurrences = [n for n in self._occurrences[key] if _attached(n, component)]
+      if len(occurrences) < 2:
+        continue
+      holder = next((n for n in occurrences if isinstance(n.parent, ASTAssignmentExpr)), None)
+      if holder is not None:
+        name = holder.parent.binding.name
+      else:
+        name = next('_cse%d'%i for i in itertools.count() if '_cse%d'%i not in names)
+        names.add(name)
+      for n in occurrences:
+        if n is not holder:
+          n.parent.children = [ASTID(name) if c is n else c for c in n.parent.children]
+      if holder is None:
+        new_bindings.append(ASTAssignmentExpr(name, occurrences[0]))
+      self.changes.append((component.name, "bound %s to '%s' for %d uses" % (sexpr(occurrences[0]), name, len(occurrences))))
+    if new_bindings:
+      component.children = list(component.children)+new_bindings
+
+class FlowgraphOptimization(object):
+  '''A pass over the flowgraphs of a FGIR; visit() returns the new flowgraph.
+  Passes record what they changed as (component, message) pairs in self.changes.'''
+  def __init__(self):
+    self.changes = []
+  def visit(self, flowgraph):
+    return flowgraph
+
+class DeadCodeElimination(FlowgraphOptimization):
+  """
+    A flowgraph pass which removes every node that does not reach an output;
+    inputs are kept, since they are part of the component's signature
+
+    Examples
+    --------
+    >>> fg = Flowgraph('c')
+    >>> x = fg.new_node(FGNodeType.input, 'x')
+    >>> y = fg.new_node(FGNodeType.assignment, 'y', [x.nodeid])
+    >>> z = fg.new_node(FGNodeType.assignment, 'z', [x.nodeid])
+    >>> out = fg.new_node(FGNodeType.output, 'y', [y.nodeid])
+    >>> dce = DeadCodeElimination()
+    >>> sorted(dce.visit(fg).nodes)
+    ['@0', '@1', '@3']
+    >>> dce.changes
+    [('c', "removed unused binding 'z'")]
+  """
+  def visit(self, flowgraph):
+    live = set(flowgraph.inputs)
+    stack = list(flowgraph.outputs)
+    while stack:
+      nodeid = stack.pop()
+      if nodeid not in live:
+        live.add(nodeid)
+        stack.extend(flowgraph.pre(nodeid))
+    dead = [i for i in flowgraph.nodes if i not in live]
+    for nodeid in dead:
+      n = flowgraph.nodes[nodeid]
+      if n.type == FGNodeType.assignment:
+        self.changes.append((flowgraph.name, "removed unused binding '%s'" % n.ref))
+    flowgraph.remove_nodes(dead)
+    return flowgraph
+
+class InlineComponents(FlowgraphOptimization):
+  """
+    A pass over the whole program which replaces each call of one of its
+    components by a copy of the flowgraph of that component, so that a
+    component and everything it calls run as a single dataflow graph;
+    callees are inlined into before their callers, whatever their order
+
+    Parameters
+    ----------
+    ir: the FGIR of the program
+
+    Examples
+    --------
+    >>> import operator
+    >>> ir = FGIR()
+    >>> neg = ir['neg'] = Flowgraph('neg')
+    >>> x = neg.new_node(FGNodeType.input, 'x')
+    >>> y = neg.new_node(FGNodeType.operator, operator.neg, [x.nodeid])
+    >>> _ = neg.new_node(FGNodeType.output, 'y', [y.nodeid])
+    >>> c = ir['c'] = Flowgraph('c')
+    >>> t = c.new_node(FGNodeType.input, 't')
+    >>> call = c.new_node(FGNodeType.component, 'neg', [t.nodeid])
+    >>> _ = c.new_node(FGNodeType.output, 'u', [call.nodeid])
+    >>> inline = ir.flowgraph_pass(InlineComponents(ir))
+    >>> print(ir['c'].pprint())
+    c
+      FGNode(@0, input, 't', [])
+      FGNode(@3, operator, neg, [@0])
+      FGNode(@2, output, 'u', [@3])
+    >>> inline.changes
+    [('c', "inlined component 'neg'")]
+  """
+  def __init__(self, ir):
+    super().__init__()
+    self.ir = ir
+    self._done = set()
+    self._inlining = []
+
+  def visit(self, flowgraph):
+    if flowgraph.name in self._done:
+      return flowgraph
+    self._inlining.append(flowgraph.name)
+    calls = [i for (i,n) in flowgraph.nodes.items() if n.type == FGNodeType.component]
+    results = {} # {call nodeid => nodeid of its inlined result}
+    for nodeid in calls:
+      results[nodeid] = self._inline(flowgraph, flowgraph.nodes[nodeid], results)
+    if calls:
+      # Consumers of the calls are rewired in a single pass over the graph
+      for n in flowgraph.nodes.values():
+        n.inputs = [results.get(i, i) for i in n.inputs]
+      flowgraph.remove_nodes(calls)
+    self._inlining.pop()
+    self._done.add(flowgraph.name)
+    return flowgraph
+
+  def _inline(self, flowgraph, call, results):
+    name = call.ref
+    if name in self._inlining:
+      raise SyntaxError("Recursive call of component '%s' in component '%s'"%(name,flowgraph.name))
+    callee = self.visit(self.ir[name])
+    if len(call.inputs) != len(callee.inputs):
+      raise SyntaxError("Component '%s' takes %d input(s) but %d were given in component '%s'"
+                        %(name,len(callee.inputs),len(call.inputs),flowgraph.name))
+    if len(callee.outputs) != 1:
+      raise SyntaxError("Component '%s' has %d outputs and cannot be called in component '%s'"
+                        %(name,len(callee.outputs),flowgraph.name))
+    # Calls nested in the arguments were inlined before this one
+    copies = dict(zip(callee.inputs, [results.get(i, i) for i in call.inputs]))
+    for nodeid in callee.topological_sort():
+      n = callee.nodes[nodeid]
+      if n.type in (FGNodeType.assignment, FGNodeType.output):
+        # Bindings of the callee are aliases, and its names mean nothing here
+        copies[nodeid] = copies[n.inputs[0]]
+      elif nodeid not in copies:
+        copy = flowgraph.new_node(n.type, n.ref, [copies[i] for i in n.inputs])
+        copy.position = n.position
+        copies[nodeid] = copy.nodeid
+    self.changes.append((flowgraph.name, "inlined component '%s'" % name))
+    return copies[callee.outputs[0]]
+
+class ValueNumbering(FlowgraphOptimization):
+  """
+    A flowgraph pass which computes identical nodes only once: two calls of
+    the same function on the same values are merged. It finds what CSE on the
+    AST cannot see, like work shared by inlined components.
+
+    Examples
+    --------
+    >>> import operator
+    >>> fg = Flowgraph('c')
+    >>> t = fg.new_node(FGNodeType.input, 't')
+    >>> a = fg.new_node(FGNodeType.operator, operator.neg, [t.nodeid])
+    >>> b = fg.new_node(FGNodeType.operator, operator.neg, [t.nodeid])
+    >>> s = fg.new_node(FGNodeType.operator, operator.add, [a.nodeid, b.nodeid])
+    >>> _ = fg.new_node(FGNodeType.output, 's', [s.nodeid])
+    >>> vn = ValueNumbering()
+    >>> print(vn.visit(fg).pprint())
+    c
+      FGNode(@0, input, 't', [])
+      FGNode(@1, operator, neg, [@0])
+      FGNode(@3, operator, add, [@1, @1])
+      FGNode(@4, output, 's', [@3])
+    >>> vn.changes
+    [('c', 'computed neg once for 2 uses')]
+  """
+  def visit(self, flowgraph):
+    values = {} # {key => nodeid}
+    merged = collections.OrderedDict() # {nodeid => the node computing the same value}
+    for nodeid in flowgraph.topological_sort():
+      n = flowgraph.nodes[nodeid]
+      n.inputs = [merged.get(i, i) for i in n.inputs]
+      if n.type == FGNodeType.literal:
+        key = (n.type, type(n.ref), n.ref)
+      elif n.type in (FGNodeType.operator, FGNodeType.libraryfunction, FGNodeType.librarymethod):
+        key = (n.type, n.ref, tuple(self._value(flowgraph, i) for i in n.inputs))
+      else:
+        continue
+      try:
+        nodeid = values.setdefault(key, nodeid)
+      except TypeError:
+        # Unhashable literal or function
+        continue
+      if nodeid != n.nodeid:
+        merged[n.nodeid] = nodeid
+    uses = collections.Counter(merged.values())
+    for (nodeid,count) in uses.items():
+      n = flowgraph.nodes[nodeid]
+      if n.type != FGNodeType.literal:
+        name = getattr(n.ref, '__name__', None) or repr(n.ref)
+        self.changes.append((flowgraph.name, 'computed %s once for %d uses' % (name, count+1)))
+    flowgraph.remove_nodes(merged)
+    return flowgraph
+
+  def _value(self, flowgraph, nodeid):
+    # Bindings are aliases of the value flowing into them
+    while flowgraph.nodes[nodeid].type == FGNodeType.assignment:
+      nodeid = flowgraph.nodes[nodeid].inputs[0]
+    return nodeid
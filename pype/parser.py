@@ -1,6 +1,10 @@
+import copy
+import os
+import threading
+
 import ply.yacc
 
-from .lexer import tokens,reserved, find_column
+from .lexer import tokens,reserved, find_column, report, new_lexer
 from .ast import *
 
 # Here's an example production rule which constructs an AST node
@@ -78,26 +82,30 @@ def p_assign(p):
   r'''expression : LPAREN ASSIGN ID expression RPAREN'''
   p[0] = ASTAssignmentExpr(p[3], p[4])
 
+def _position(p):
+  'The line and column of the opening parenthesis of an expression.'
+  return (p.lineno(1), find_column(p.lexer.lexdata, p.slice[1]))
+
 def p_funcexpr(p):
   r'''expression : LPAREN ID parameter_list RPAREN
                  | LPAREN ID RPAREN'''
   if len(p)>4:
-    p[0] = ASTEvalExpr(ASTID(p[2]),p[3])
+    p[0] = ASTEvalExpr(ASTID(p[2]),p[3],_position(p))
   else:
-    p[0] = ASTEvalExpr(ASTID(p[2]),())
+    p[0] = ASTEvalExpr(ASTID(p[2]),(),_position(p))
 
 def p_op_add_expression(p):
   r'''expression : LPAREN OP_ADD parameter_list RPAREN'''
-  p[0] = ASTEvalExpr(ASTID(name='__add__'), p[3])
+  p[0] = ASTEvalExpr(ASTID(name='__add__'), p[3], _position(p))
 def p_op_sub_expression(p):
   r'''expression : LPAREN OP_SUB parameter_list RPAREN'''
-  p[0] = ASTEvalExpr(ASTID(name='__sub__'), p[3])
+  p[0] = ASTEvalExpr(ASTID(name='__sub__'), p[3], _position(p))
 def p_op_mul_expression(p):
   r'''expression : LPAREN OP_MUL parameter_list RPAREN'''
-  p[0] = ASTEvalExpr(ASTID(name='__mul__'), p[3])
+  p[0] = ASTEvalExpr(ASTID(name='__mul__'), p[3], _position(p))
 def p_op_div_expression(p):
   r'''expression : LPAREN OP_DIV parameter_list RPAREN'''
-  p[0] = ASTEvalExpr(ASTID(name='__truediv__'), p[3])
+  p[0] = ASTEvalExpr(ASTID(name='__truediv__'), p[3], _position(p))
 
 def p_exprid(p):
   r'''expression : ID'''
@@ -119,12 +127,63 @@ def p_parameter_list(p):
 
 def p_error(p):
     if p:
-        print("Syntax error at '%s'"% str(p.value),"at line %d"%p.lexer.lineno+", column",find_column(p.lexer.lexdata, p))
+        report(p.lexer, "Syntax error at '%s' at line %d, column %d" % (str(p.value), p.lexer.lineno, find_column(p.lexer.lexdata, p)))
          # Just discard the token and tell the parser it's okay.
-        parser.errok()
+        (getattr(p.lexer, 'parser', None) or get_parser()).errok()
     else:
-        print("Syntax error at EOF")
+        report(getattr(_current, 'lexer', None), "Syntax error at EOF")
 
 start = 'program'
-parser = ply.yacc.yacc() # To get more information, add debug=True
+
+# The parser is built on first use, from the prebuilt tables in parsetab.py,
+# which are never rewritten at runtime. After changing the grammar, regenerate
+# them with: python -m pype.parser
+_parser = None
+_lock = threading.Lock()
+_current = threading.local() # The lexer of the compilation running in this thread
+
+def get_parser():
+  'Returns the shared parser, building it on first use.'
+  global _parser
+  with _lock:
+    if _parser is None:
+      _parser = ply.yacc.yacc(tabmodule='pype.parsetab', optimize=True, write_tables=False, debug=False)
+  return _parser
+
+def new_parser():
+  '''Returns a parser of its own for one compilation. PLY parsers keep their
+  parsing state on the instance, so one cannot be shared between threads; the
+  copy shares the (read-only) tables of the shared parser.'''
+  parser = copy.copy(get_parser())
+  parser.errorok = True
+  return parser
+
+def parse(source):
+  '''Parses a program into an AST with a lexer and parser of its own, so that
+  programs can be parsed from several threads at once. Raises SyntaxError for
+  the first lexing or parsing error.'''
+  lexer = new_lexer()
+  lexer.parser = new_parser()
+  _current.lexer = lexer
+  try:
+    ast = lexer.parser.parse(source, lexer=lexer)
+  finally:
+    _current.lexer = None
+  if lexer.errors:
+    raise SyntaxError(lexer.errors[0])
+  if ast is None:
+    raise SyntaxError('Syntax error at EOF')
+  return ast
+
+def write_tables():
+  'Regenerates parsetab.py from the grammar.'
+  ply.yacc.yacc(tabmodule='parsetab', outputdir=os.path.dirname(os.path.abspath(__file__)), debug=False)
+
+def __getattr__(name):
+  if name == 'parser':
+    return get_parser()
+  raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+if __name__ == '__main__':
+  write_tables()
 
@@ -0,0 +1,264 @@
+import collections
+import numbers
+
+from .fgir import *
+from .batch import run_batch
+from .component import accepts_out, return_type
+from .stream import StreamPlan, run_stream
+
+FUNCTION_NODES = (FGNodeType.operator, FGNodeType.libraryfunction, FGNodeType.librarymethod)
+
+Instruction = collections.namedtuple('Instruction','dest func args')
+
+def _cannot_alias(func):
+  'Whether the result of func is known never to be, or to share, one of its arguments.'
+  return accepts_out(func) or return_type(func) is numbers.Real
+
+class PCode(object):
+  """
+    An executable component: a flat, topologically ordered list of instructions
+    whose functions were all resolved at compile time
+
+    Parameters
+    ----------
+    name: a string representing the name of the component
+    inputs: a sequence of input names, in declaration order
+    outputs: a sequence of names holding the output values, in declaration order
+    constants: a dictionary from names to literal values
+    instructions: a list of Instruction(dest, func, args) tuples
+    positions: the (line, column) in the source of the expression of each
+        instruction, or None
+
+    Returns
+    -------
+    __call__(*args): value
+        binds args to the inputs, runs every instruction and returns the output
+        value, or a tuple of them if there is not exactly one
+    run_batch(inputs): list
+        returns the result of each element of inputs, which are the input
+        values for one-input components and tuples of them otherwise
+    run_stream(chunks, spill): generator
+        returns the results for inputs arriving as an iterable of chunks
+
+    Examples
+    --------
+    >>> import operator
+    >>> p = PCode('double', ['x'], ['y'], {'%0':2}, [Instruction('y', operator.mul, ('x','%0'))])
+    >>> p(21)
+    42
+    >>> p()
+    Traceback (most recent call last):
+        ...
+    TypeError: double() takes 1 input(s) but 0 were given
+  """
+  def __init__(self, name, inputs, outputs, constants, instructions, positions=None):
+    self.name = name
+    self.inputs = tuple(inputs)
+    self.outputs = tuple(outputs)
+    self.constants = dict(constants)
+    self.instructions = [Instruction(dest, func, tuple(args)) for (dest,func,args) in instructions]
+    self.positions = list(positions) if positions else [None]*len(self.instructions)
+    self._stream_plan = None
+    self.profiler = None
+    self._plan()
+
+  def __getstate__(self):
+    # A profiler measures one process; cached code is stored without it
+    state = self.__dict__.copy()
+    state['profiler'] = None
+    return state
+
+  def _plan(self):
+    '''Assigns every value of the component a fixed slot in an execution
+    frame, inputs first, so that running it indexes a list instead of looking
+    names up; the names are kept for diagnostics, in self.slots.
+
+    Liveness analysis: for each instruction, the values used for the last
+    time by it, which are dropped as soon as it runs. Values computed by
+    kernels taking an out= buffer belong to the run, and once dead their
+    memory is reused for the result of a later such kernel, provided that
+    nothing else can still refer to it: every function they were passed to
+    must be such a kernel, or return a scalar. Any other function may return
+    its argument, or a part of it, and so keep it alive under another name.'''
+    self.slots = collections.OrderedDict() # {name => slot}
+    for name in self.inputs:
+      self.slots.setdefault(name, len(self.slots))
+    for name in self.constants:
+      self.slots.setdefault(name, len(self.slots))
+    for ins in self.instructions:
+      self.slots.setdefault(ins.dest, len(self.slots))
+    self._frame = [None]*len(self.slots)
+    for (name,value) in self.constants.items():
+      self._frame[self.slots[name]] = value
+    self._output_slots = tuple(self.slots[o] for o in self.outputs)
+    last_use = {}
+    for (i,ins) in enumerate(self.instructions):
+      for a in ins.args:
+        last_use[a] = i
+    for o in self.outputs:
+      last_use.pop(o, None)
+    aliased = set() # Values passed to functions which may keep a reference
+    for ins in self.instructions:
+      if not _cannot_alias(ins.func):
+        aliased.update(ins.args)
+    dying = [[] for ins in self.instructions]
+    for (name,i) in last_use.items():
+      if name not in self.constants:
+        dying[i].append(name)
+    self._schedule = []
+    self._reuses = False
+    for (i,(dest,func,args)) in enumerate(self.instructions):
+      out = accepts_out(func)
+      self._reuses = self._reuses or out
+      # Only values the run computed may be overwritten, never the inputs:
+      # (slot, position among the arguments) of the dying computed values
+      owned = tuple((self.slots[name], args.index(name)) for name in dying[i]
+                    if name not in self.inputs and name not in aliased)
+      self._schedule.append((self.slots[dest], func, tuple(self.slots[a] for a in args),
+                             tuple(self.slots[name] for name in dying[i]), owned, out))
+
+  def __repr__(self):
+    return '<PCode %s(%s)>' % (self.name, ', '.join(self.inputs))
+
+  def pprint(self):
+    '''Returns a human-readable listing of the instructions.'''
+    lines = ['%s(%s)' % (self.name, ', '.join(self.inputs))]
+    for (name,value) in self.constants.items():
+      lines.append('  %s = %r' % (name, value))
+    for (dest,func,args) in self.instructions:
+      lines.append('  %s = %s(%s)' % (dest, getattr(func,'__qualname__',func), ', '.join(args)))
+    lines.append('  return %s' % ', '.join(self.outputs))
+    return '\n'.join(lines)
+
+  def __call__(self, *args):
+    if len(args) != len(self.inputs):
+      raise TypeError('%s() takes %d input(s) but %d were given' % (self.name, len(self.inputs), len(args)))
+    if self.profiler is not None:
+      return self.profiler.call(self, args)
+    return self._execute(args)
+
+  def _execute(self, args, schedule=None):
+    # A profiler passes a schedule of its own, with instrumented functions
+    schedule = self._schedule if schedule is None else schedule
+    frame = self._frame[:]
+    frame[:len(args)] = args
+    if self._reuses:
+      self._run_reusing(frame, schedule)
+    else:
+      for (dest,func,argslots,dying,_,_) in schedule:
+        frame[dest] = func(*[frame[a] for a in argslots])
+        for slot in dying:
+          frame[slot] = None
+    if len(self._output_slots) == 1:
+      return frame[self._output_slots[0]]
+    return tuple(frame[o] for o in self._output_slots)
+
+  def _run_reusing(self, frame, schedule):
+    owned = set() # Slots of values computed by kernels taking out=
+    free = [] # Dead values of the run, whose memory can be reused
+    for (dest,func,argslots,dying,dead_owned,out) in schedule:
+      argv = [frame[a] for a in argslots]
+      for slot in dying:
+        frame[slot] = None
+      for (slot,position) in dead_owned:
+        if slot in owned:
+          free.append(argv[position])
+      if out and free:
+        buffer = free.pop()
+        value = func(*argv, out=buffer)
+        if value is not buffer:
+          free.append(buffer)
+      else:
+        value = func(*argv)
+      del argv
+      if out:
+        owned.add(dest)
+      frame[dest] = value
+
+  def run_batch(self, inputs):
+    '''Runs the component over many inputs at once, executing each instruction
+    across the whole batch before the next one. When the series of the batch
+    share their time axis they are stacked into 2-D arrays, and every
+    instruction becomes a single numpy call over the batch.'''
+    return run_batch(self, inputs)
+
+  def stream_plan(self):
+    if self._stream_plan is None:
+      self._stream_plan = StreamPlan(self)
+    return self._stream_plan
+
+  def run_stream(self, chunks, spill=False):
+    '''Runs the component over inputs arriving as an iterable of chunks (or of
+    tuples of chunks, for several inputs) with bounded memory, yielding the
+    result for each chunk; components with only scalar outputs yield once, at
+    the end of the stream. Components needing a second pass, like standardize,
+    buffer the chunks during the first one, in a temporary file if spill is
+    True. Components which cannot be streamed are run once, on the whole
+    concatenated input.'''
+    return run_stream(self, chunks, spill)
+
+class PCodeGenerator(object):
+  """
+    A flowgraph pass which compiles every component of a FGIR into a PCode,
+    emitting one instruction per function node in topological order
+
+    Returns
+    -------
+    visit(flowgraph): flowgraph
+        returns the flowgraph unmodified, and stores its PCode in self.pcodes
+
+    Examples
+    --------
+    >>> import operator
+    >>> fg = Flowgraph('c')
+    >>> x = fg.new_node(FGNodeType.input, 'x')
+    >>> one = fg.new_node(FGNodeType.literal, 1)
+    >>> add = fg.new_node(FGNodeType.operator, operator.add, [x.nodeid, one.nodeid])
+    >>> y = fg.new_node(FGNodeType.assignment, 'y', [add.nodeid])
+    >>> out = fg.new_node(FGNodeType.output, 'y', [y.nodeid])
+    >>> gen = PCodeGenerator()
+    >>> _ = gen.visit(fg)
+    >>> print(gen.pcodes['c'].pprint())
+    c(x)
+      %1 = 1
+      y = add(x, %1)
+      return y
+    >>> gen.pcodes['c'](41)
+    42
+  """
+  def __init__(self):
+    self.pcodes = {}
+
+  def visit(self, flowgraph):
+    order = flowgraph.topological_sort()
+    # Names of the values: inputs and bindings keep their own name, a function
+    # node takes the name of the first binding of its result, and anything else
+    # gets a temporary.
+    names = {}
+    for nodeid in order:
+      n = flowgraph.nodes[nodeid]
+      if n.type == FGNodeType.input:
+        names[nodeid] = n.ref
+      elif n.type == FGNodeType.assignment:
+        src = flowgraph.nodes[n.inputs[0]]
+        if src.nodeid not in names and src.type in FUNCTION_NODES:
+          names[src.nodeid] = n.ref
+    constants = {}
+    instructions = []
+    positions = []
+    for nodeid in order:
+      n = flowgraph.nodes[nodeid]
+      if n.type == FGNodeType.literal:
+        names[nodeid] = '%%%s' % nodeid[1:]
+        constants[names[nodeid]] = n.ref
+      elif n.type in FUNCTION_NODES:
+        names.setdefault(nodeid, '%%%s' % nodeid[1:])
+        instructions.append(Instruction(names[nodeid], n.ref, [names[i] for i in n.inputs]))
+        positions.append(n.position)
+      elif n.type in (FGNodeType.assignment, FGNodeType.output):
+        # Bindings and outputs are aliases of the value flowing into them
+        names[nodeid] = names[n.inputs[0]]
+    outputs = [names[o] for o in flowgraph.outputs]
+    inputs = [names[i] for i in flowgraph.inputs]
+    self.pcodes[flowgraph.name] = PCode(flowgraph.name, inputs, outputs, constants, instructions, positions)
+    return flowgraph
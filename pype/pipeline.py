@@ -1,20 +1,238 @@
-from .lexer import lexer
-from .parser import parser
+import collections
+import concurrent.futures
+import glob
+import io
+import os
+import time
+
+from .parser import parse
 from .ast import *
 from .semantic_analysis import CheckSingleAssignment
-from .translate import SymbolTableVisitor
+from .translate import SymbolTableVisitor, LoweringVisitor
+from .optimize import ConstantFolding, CommonSubexpressionElimination, DeadCodeElimination, InlineComponents, ValueNumbering
+from .typecheck import TypeInference
+from .pcode import PCodeGenerator
+from .executor import ParallelExecutor
+from .memo import Memo
+from .profile import Profiler
+from .cache import CompileCache
+from .incremental import split_statements, changed_components, with_callees, blank_except, COMPONENT
+from .symtab import SymbolTable, SymbolType
+from .fgir import FGIR
+from .transpile import PythonGenerator
+
+# What a reload recompiled: error is None if the edit compiled
+Reload = collections.namedtuple('Reload','recompiled error')
 
 class Pipeline(object):
-  def __init__(self, source):
+  def __init__(self, source, constant_folding=True, subexpression_elimination=True, cache=None, profile=False):
+    self.source = source
+    self.constant_folding = constant_folding
+    self.subexpression_elimination = subexpression_elimination
+    # cache: a CompileCache, or True for the default one
+    self.cache = CompileCache() if cache is True else (cache or None)
+    # profile: measure every node of every component as it runs
+    self.profiler = Profiler() if profile else None
     with open(source) as f:
       self.compile(f)
 
   def compile(self, file):
     input = file.read()
-    # Lexing, parsing, AST construction
-    ast = parser.parse(input, lexer=lexer)
-    # Semantic analysis
-    ast.walk( CheckSingleAssignment() )
+    key = None
+    program = None
+    if self.cache is not None:
+      key = self.cache.key(input, self._options())
+      program = self.cache.load(key) if key is not None else None
+    if program is None:
+      program = self._compile(input)
+      if key is not None:
+        self.cache.store(key, program)
+    self.__dict__.update(program)
+    self._input = input
+    self._statements = split_statements(input)
+    self._attach_profiler()
+    return self.symbols
+
+  def _options(self):
+    return (self.constant_folding, self.subexpression_elimination)
+
+  def _compile(self, input):
+    '''Compiles a program, returning its symbols, ir, components and
+    optimizations in a dictionary.'''
+    # Lexing, parsing, AST construction, with a lexer and parser of this
+    # compilation's own so that programs compile concurrently
+    ast = parse(input)
+    # AST optimization
+    optimizations = []
+    if self.constant_folding:
+      folder = ConstantFolding()
+      ast = ast.mod_walk( folder )
+      optimizations += folder.changes
+    if self.subexpression_elimination:
+      cse = CommonSubexpressionElimination()
+      ast = ast.mod_walk( cse )
+      optimizations += cse.changes
+    # Semantic analysis and the symbol table, in a single traversal. Folding
+    # keeps every binding, and elimination only adds _cseN bindings named
+    # apart from every name of their component: checking after them reports
+    # the same errors as before.
+    _, syms = ast.walk( MultiVisitor(CheckSingleAssignment(), SymbolTableVisitor()) )
     # Translation
-    syms = ast.walk( SymbolTableVisitor() )
-    return syms
+    ir = ast.mod_walk( LoweringVisitor(syms) )
+    # Flowgraph optimization
+    optimizations += ir.flowgraph_pass( DeadCodeElimination() ).changes
+    # Whole-program scheduling: calls of components are inlined, so that work
+    # shared between the components a component calls is computed once and
+    # independent calls are independent nodes of a single graph
+    optimizations += ir.flowgraph_pass( InlineComponents(ir) ).changes
+    if self.subexpression_elimination:
+      optimizations += ir.flowgraph_pass( ValueNumbering() ).changes
+    # Type inference, binding operators to kernels specialized for their types
+    ir.flowgraph_pass( TypeInference(syms) )
+    # Code generation
+    pcodegen = PCodeGenerator()
+    ir.flowgraph_pass( pcodegen )
+    return {'symbols':syms, 'ir':ir, 'components':pcodegen.pcodes, 'optimizations':optimizations}
+
+  def reload(self):
+    '''Recompiles the source file after an edit. Only the components whose
+    source changed, and the components calling them, are parsed and compiled
+    again, along with the components they call; the others keep their
+    compiled code. Everything is recompiled if the imports changed. Returns
+    the names of the changed components; on a SyntaxError the pipeline is
+    left as it was.'''
+    with open(self.source) as f:
+      input = f.read()
+    if input == self._input:
+      return []
+    statements = split_statements(input)
+    changed = None
+    if statements is not None and self._statements is not None:
+      changed = changed_components(self._statements, statements)
+    if changed is None:
+      self.compile(io.StringIO(input))
+      return list(self.components)
+    program = self._compile(blank_except(input, statements, with_callees(statements, changed))) if changed else None
+    self._merge(program, [s.name for s in statements if s.kind == COMPONENT])
+    self._input = input
+    self._statements = statements
+    self._attach_profiler()
+    if self.cache is not None:
+      key = self.cache.key(input, self._options())
+      if key is not None:
+        self.cache.store(key, {name:getattr(self,name) for name in ('symbols','ir','components','optimizations')})
+    return changed
+
+  def _merge(self, program, order):
+    '''Replaces the recompiled components, drops the removed ones and puts
+    the components in the order of the new source.'''
+    program = program or {'symbols':SymbolTable(), 'ir':FGIR(), 'components':{}, 'optimizations':[]}
+    recompiled = set(program['components'])
+    symbols = SymbolTable()
+    for (name,sym) in self.symbols['global'].items():
+      if sym.type != SymbolType.component or name in order:
+        symbols.addsym(sym)
+    for sym in program['symbols']['global'].values():
+      symbols.addsym(sym)
+    ir = FGIR()
+    components = {}
+    for name in order:
+      source = program if name in recompiled else self.__dict__
+      symbols.addscope(name)
+      symbols[name].update(source['symbols'][name])
+      ir[name] = source['ir'][name]
+      components[name] = source['components'][name]
+    by_component = collections.defaultdict(list)
+    for change in self.optimizations:
+      if change[0] not in recompiled:
+        by_component[change[0]].append(change)
+    for change in program['optimizations']:
+      by_component[change[0]].append(change)
+    self.symbols = symbols
+    self.ir = ir
+    self.components = components
+    self.optimizations = [change for name in order for change in by_component[name]]
+
+  def _attach_profiler(self):
+    if self.profiler is not None:
+      self.profiler.source = self._input
+      for pcode in self.components.values():
+        pcode.profiler = self.profiler
+
+  def profile_report(self):
+    'Returns the measurements of the profiled components, hot spots first.'
+    if self.profiler is None:
+      raise ValueError('%s was not compiled with profile=True' % self.source)
+    return self.profiler.report()
+
+  def watch(self, interval=1.0):
+    '''Polls the source file for edits, reloading it when it changes, and
+    yields a Reload(recompiled, error) after each reload; error is the
+    SyntaxError of an edit which did not compile, in which case the pipeline
+    keeps its previous components.'''
+    mtime = os.stat(self.source).st_mtime_ns
+    while True:
+      time.sleep(interval)
+      try:
+        current = os.stat(self.source).st_mtime_ns
+      except OSError:
+        continue
+      if current == mtime:
+        continue
+      mtime = current
+      try:
+        yield Reload(self.reload(), None)
+      except SyntaxError as e:
+        yield Reload([], e)
+
+  def __getitem__(self, component):
+    return self.components[component]
+
+  def parallel(self, component, workers=None):
+    '''Returns a new executor running independent nodes of a component
+    concurrently; its threads stop on shutdown() or when it is garbage
+    collected.'''
+    return ParallelExecutor(self.components[component], workers)
+
+  def memoize(self, component, max_entries=1024, directory=None):
+    'Returns the component with its results memoized by the fingerprints of its inputs.'
+    return Memo(self.components[component], max_entries, directory)
+
+  def transpile(self):
+    'Returns the source of a Python module with one function per component.'
+    return PythonGenerator(self.components, os.path.basename(self.source)).generate()
+
+# The outcome of compiling one program: error is None if it compiled
+CompileResult = collections.namedtuple('CompileResult','pipeline error')
+
+def _compile_one(path, options):
+  try:
+    return CompileResult(Pipeline(path, **options), None)
+  except Exception as e:
+    # Whatever stops one program, like an import which fails, is its result
+    return CompileResult(None, e)
+
+def compile_many(paths, workers=None, **options):
+  '''Compiles many programs in parallel, in worker processes, and returns an
+  ordered dictionary from each path to its CompileResult: one program failing
+  to compile does not stop the others. paths may also be a directory, for its
+  .ppl files. workers defaults to the number of CPUs; with workers=1,
+  programs compile in this process. options are passed on to Pipeline.'''
+  if isinstance(paths, str):
+    paths = sorted(glob.glob(os.path.join(paths, '*.ppl')))
+  paths = list(paths)
+  workers = min(workers or os.cpu_count() or 1, len(paths) or 1)
+  results = collections.OrderedDict()
+  if workers == 1:
+    for path in paths:
+      results[path] = _compile_one(path, options)
+    return results
+  with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+    futures = [(path, pool.submit(_compile_one, path, options)) for path in paths]
+    for (path,future) in futures:
+      try:
+        results[path] = future.result()
+      except Exception as e:
+        # For instance, a program using closures cannot be sent back
+        results[path] = CompileResult(None, e)
+  return results
@@ -0,0 +1,183 @@
+import collections
+import time
+import tracemalloc
+
+class NodeStats(object):
+  '''What was measured for one instruction of a component.'''
+  def __init__(self, index, label, position):
+    self.index = index
+    self.label = label
+    self.position = position
+    self.calls = 0
+    self.self_time = 0.0
+    self.cumulative_time = 0.0 # Computed by Profiler.stats()
+    self.allocated = 0 # Bytes, at the peak of (or held after) each call, summed
+
+class ComponentStats(object):
+  '''What was measured for one component, and for each of its instructions.'''
+  def __init__(self, name, nodes):
+    self.name = name
+    self.nodes = nodes
+    self.calls = 0
+    self.time = 0.0
+
+  @property
+  def overhead(self):
+    'The time spent running the component outside of its instructions.'
+    return self.time - sum(n.self_time for n in self.nodes)
+
+class _Instrumented(object):
+  '''Stands for the function of an instruction, measuring its calls.'''
+  def __init__(self, func, stats, profiler):
+    self.func = func
+    self.stats = stats
+    self.profiler = profiler
+
+  def __call__(self, *args, **kwargs):
+    # The peak is only reset when it is ours: tracemalloc started by someone
+    # else, or a Python without reset_peak, is measured by snapshot differences
+    owned = self.profiler._owns_peak
+    if owned:
+      before = tracemalloc.get_traced_memory()[0]
+      tracemalloc.reset_peak()
+    else:
+      snapshot = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    try:
+      return self.func(*args, **kwargs)
+    finally:
+      self.stats.self_time += time.perf_counter()-start
+      if owned:
+        self.stats.allocated += max(tracemalloc.get_traced_memory()[1]-before, 0)
+      else:
+        diff = tracemalloc.take_snapshot().compare_to(snapshot, 'filename')
+        self.stats.allocated += sum(d.size_diff for d in diff if d.size_diff > 0)
+      self.stats.calls += 1
+
+def expression_at(source, position):
+  '''Returns the source of the expression starting at a (line, column)
+  position, as reported by the lexer, on a single line.'''
+  if source is None or position is None:
+    return None
+  (line, column) = position
+  start = 0
+  for _ in range(line-1):
+    start = source.find('\n', start)+1
+    if start == 0:
+      return None
+  i = start+column-1 # Columns are counted from 1
+  depth = 0
+  for j in range(i, len(source)):
+    if source[j] == '(':
+      depth += 1
+    elif source[j] == ')':
+      depth -= 1
+      if depth == 0:
+        return ' '.join(source[i:j+1].split())
+  return None
+
+class Profiler(object):
+  """
+    A class that measures, for each component it is attached to and for each
+    instruction of it, the number of calls, the time spent in the instruction
+    itself and in everything computing its arguments, and the memory allocated;
+    instructions map back to the expression they were compiled from
+
+    Attach it by setting pcode.profiler; memory is measured with tracemalloc,
+    which is started on the first call unless it is tracing already. Memory
+    is the peak of each call when the profiler started tracemalloc (on Python
+    3.9 and later), else what each call allocated and still holds.
+
+    Parameters
+    ----------
+    source: the text of the program, to show the profiled expressions
+
+    Returns
+    -------
+    stats(): list
+        returns a ComponentStats for each component which ran
+    report(): string
+        returns a table per component, with its hot spots first
+
+    Examples
+    --------
+    >>> import operator
+    >>> from .pcode import PCode, Instruction
+    >>> p = PCode('c', ['x'], ['y'], {}, [Instruction('y', operator.neg, ('x',))], [(1, 21)])
+    >>> p.profiler = Profiler('{ c (input x) (:= y (- x)) (output y) }')
+    >>> p(1)
+    -1
+    >>> [(n.label, n.calls) for n in p.profiler.stats()[0].nodes]
+    [('(- x)', 1)]
+    >>> p.profiler.stop()
+  """
+  def __init__(self, source=None):
+    self.source = source
+    self._components = collections.OrderedDict() # {id(pcode) => (pcode, stats, schedule)}
+    self._started = False
+    self._owns_peak = False # Whether the peak of tracemalloc may be reset
+
+  def call(self, pcode, args):
+    entry = self._components.get(id(pcode))
+    if entry is None or entry[0] is not pcode:
+      entry = self._instrument(pcode)
+    (_, stats, schedule) = entry
+    if not tracemalloc.is_tracing():
+      tracemalloc.start()
+      self._started = True
+      self._owns_peak = hasattr(tracemalloc, 'reset_peak')
+    start = time.perf_counter()
+    try:
+      return pcode._execute(args, schedule)
+    finally:
+      stats.time += time.perf_counter()-start
+      stats.calls += 1
+
+  def _instrument(self, pcode):
+    nodes = []
+    schedule = []
+    for (i,((dest,func,args),entry)) in enumerate(zip(pcode.instructions, pcode._schedule)):
+      position = pcode.positions[i]
+      label = expression_at(self.source, position) or '%s(%s)' % (getattr(func, '__qualname__', func), ', '.join(args))
+      nodes.append(NodeStats(i, label, position))
+      schedule.append((entry[0], _Instrumented(entry[1], nodes[-1], self))+entry[2:])
+    entry = (pcode, ComponentStats(pcode.name, nodes), schedule)
+    self._components[id(pcode)] = entry
+    return entry
+
+  def stop(self):
+    'Stops tracemalloc, if the profiler started it.'
+    if self._started:
+      tracemalloc.stop()
+      self._started = False
+      self._owns_peak = False
+
+  def stats(self):
+    result = []
+    for (pcode, stats, _) in self._components.values():
+      # The cumulative time of an instruction includes the instructions its
+      # arguments depend on, each counted once
+      producer = dict((ins.dest, i) for (i,ins) in enumerate(pcode.instructions))
+      for (i,node) in enumerate(stats.nodes):
+        seen = set([i])
+        stack = [i]
+        while stack:
+          for a in pcode.instructions[stack.pop()].args:
+            j = producer.get(a)
+            if j is not None and j not in seen:
+              seen.add(j)
+              stack.append(j)
+        node.cumulative_time = sum(stats.nodes[j].self_time for j in seen)
+      result.append(stats)
+    return result
+
+  def report(self):
+    lines = []
+    for stats in self.stats():
+      lines.append('%s: %d calls, %.3f ms, %.3f ms outside instructions' % (stats.name, stats.calls, stats.time*1e3, stats.overhead*1e3))
+      lines.append('  %8s %10s %10s %10s  %-9s %s' % ('calls', 'self ms', 'cum ms', 'alloc KB', 'line:col', 'expression'))
+      for node in sorted(stats.nodes, key=lambda n: -n.self_time):
+        where = '%d:%d' % node.position if node.position else '-'
+        lines.append('  %8d %10.3f %10.3f %10.1f  %-9s %s' % (node.calls, node.self_time*1e3, node.cumulative_time*1e3,
+                                                          node.allocated/1024., where, node.label))
+    return '\n'.join(lines)
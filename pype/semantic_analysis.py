@@ -42,8 +42,8 @@ class CheckSingleAssignment(ASTVisitor):
     Returns
     -------
     __init__: 
-        returns nothing, but sets the pairs attribute of the visitor to [], the component attribute of the visitor to None
-        and the components attribute of the visitor to []
+        returns nothing, but sets the names attribute of the visitor to an empty set, the component attribute of the visitor to None
+        and the components attribute of the visitor to an empty set
     
     Examples
     --------
@@ -64,28 +64,24 @@ class CheckSingleAssignment(ASTVisitor):
     SyntaxError: Multiple assignment of 'a' in component 'comp1' is not supported
   """
   def __init__(self):
-    self.pairs = []
+    self.names = set() # The names bound in the current component
     self.component = None
-    self.components = []
+    self.components = set()
+
+  def _bind(self, name):
+    if name in self.names:
+      raise SyntaxError("Multiple assignment of '%s' in component '%s' is not supported"%(name,self.component))
+    self.names.add(name)
 
   def visit(self, node):
     if isinstance(node,ASTComponent):
         self.component = node.name
         if self.component in self.components:
             raise SyntaxError("Multiple assignment of component '%s' is not supported"%self.component)
-        else:
-            self.components += [self.component] 
-        self.pairs = [(self.component,self.component)]
+        self.components.add(self.component)
+        self.names = set([self.component])
     if isinstance(node,ASTAssignmentExpr):
-        pair = (node.binding.name,self.component)
-        if pair in self.pairs:
-            raise SyntaxError("Multiple assignment of '%s' in component '%s' is not supported"%pair)
-        else:
-            self.pairs += [pair]     
+        self._bind(node.binding.name)
     if isinstance(node,ASTInputExpr):
         for child in node.children:
-            pair = (child.name,self.component)
-            if pair in self.pairs:
-                raise SyntaxError("Multiple assignment of '%s' in component '%s' is not supported"%pair)
-            else:
-                self.pairs += [pair] 
+            self._bind(child.name)
@@ -0,0 +1,277 @@
+import asyncio
+import collections
+import json
+import os
+import time
+
+import numpy as np
+
+from .executor import _unsafe_lock
+from .lib_import import is_threadsafe
+from .pipeline import Pipeline
+
+# The server only listens locally: there is no authentication
+LOCAL_HOSTS = ('127.0.0.1', '::1', 'localhost')
+
+# The longest request line, in bytes: series payloads are large
+MAX_REQUEST = 256*1024*1024
+
+def percentile(values, p):
+  'Returns the p-th percentile of a sorted sequence, by nearest rank.'
+  if not values:
+    return None
+  rank = max(int(-(-p*len(values)//100)), 1) # ceil, from 1
+  return values[min(rank, len(values))-1]
+
+def encode(value):
+  'Returns a JSON-serializable form of a component result.'
+  if hasattr(value, 'time') and hasattr(value, 'data'):
+    return {'time': np.asarray(value.time).tolist(), 'data': np.asarray(value.data).tolist()}
+  if isinstance(value, tuple):
+    return [encode(v) for v in value]
+  if isinstance(value, np.ndarray):
+    return value.tolist()
+  if isinstance(value, np.generic):
+    return value.item()
+  return value
+
+class _Batcher(object):
+  '''Collects the requests for one component, and runs them as a batch when
+  max_batch of them are waiting or the oldest waited max_delay seconds.'''
+  def __init__(self, pcode, max_batch, max_delay, window):
+    self.pcode = pcode
+    self.max_batch = max_batch
+    self.max_delay = max_delay
+    self.waiting = [] # [(args, future, enqueued)]
+    self.running = 0 # Requests in batches which have not returned
+    self.requests = 0
+    self.batches = 0
+    self.latencies = collections.deque(maxlen=window) # Seconds, of the latest requests
+    self._timer = None
+    # Batches calling a component marked threadsafe=False hold the lock of the
+    # ParallelExecutor, so they never run concurrently with another such call
+    self.threadsafe = all(is_threadsafe(ins.func) for ins in pcode.instructions)
+
+  def submit(self, args):
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    self.waiting.append((args, future, time.perf_counter()))
+    self.requests += 1
+    if len(self.waiting) >= self.max_batch:
+      self._flush()
+    elif self._timer is None:
+      self._timer = loop.call_later(self.max_delay, self._flush)
+    return future
+
+  def _flush(self):
+    if self._timer is not None:
+      self._timer.cancel()
+      self._timer = None
+    batch, self.waiting = self.waiting, []
+    if batch:
+      self.running += len(batch)
+      self.batches += 1
+      asyncio.ensure_future(self._run(batch))
+
+  async def _run(self, batch):
+    loop = asyncio.get_running_loop()
+    try:
+      results = await loop.run_in_executor(None, self._execute, [args for (args,_,_) in batch])
+    except Exception as e:
+      results = [(False, e)]*len(batch)
+    finished = time.perf_counter()
+    self.running -= len(batch)
+    for ((_,future,enqueued),(ok,value)) in zip(batch, results):
+      self.latencies.append(finished-enqueued)
+      if future.cancelled():
+        continue
+      if ok:
+        future.set_result(value)
+      else:
+        future.set_exception(value)
+
+  def _execute(self, inputs):
+    # Runs in a worker thread, so that the event loop keeps accepting requests
+    if not self.threadsafe:
+      with _unsafe_lock:
+        return self._run_batch(inputs)
+    return self._run_batch(inputs)
+
+  def _run_batch(self, inputs):
+    try:
+      if len(self.pcode.inputs) == 1:
+        values = self.pcode.run_batch([args[0] for args in inputs])
+      else:
+        values = self.pcode.run_batch(inputs)
+      return [(True, v) for v in values]
+    except Exception:
+      # One bad request must not fail the others of its batch
+      results = []
+      for args in inputs:
+        try:
+          results.append((True, self.pcode(*args)))
+        except Exception as e:
+          results.append((False, e))
+      return results
+
+  def stats(self):
+    latencies = sorted(self.latencies)
+    return {
+      'queue_depth': len(self.waiting)+self.running,
+      'requests': self.requests,
+      'batches': self.batches,
+      'mean_batch': self.requests/self.batches if self.batches else 0.0,
+      'latency_ms': dict(('p%d' % p, None if not latencies else percentile(latencies, p)*1e3) for p in (50, 90, 99)),
+    }
+
+class PipelineServer(object):
+  """
+    A class that serves the components of compiled programs to local clients,
+    over a Unix or TCP socket. Concurrent requests for the same component are
+    coalesced into micro-batches, which run through PCode.run_batch: series
+    sharing a time axis are computed by single numpy calls over the batch.
+
+    Clients send one JSON object per line and get one back per line, in the
+    order requests complete:
+      {"id": 1, "program": "example1", "component": "standardize",
+       "inputs": [{"time": [1, 2], "data": [1.0, 3.0]}]}
+      {"id": 1, "result": {"time": [1, 2], "data": [-1.0, 1.0]}}
+    program may be left out when a single program is served. {"stats": true}
+    returns the statistics of every component.
+
+    Parameters
+    ----------
+    programs: a dictionary from names to Pipelines, or a list of .ppl paths,
+        served under their base names
+    max_batch: the most requests run in one batch
+    max_delay: the seconds a request may wait for others to join its batch
+    series_type: builds series inputs from their time and data, by default
+        timeseries.TimeSeries
+    window: the number of latest requests latency percentiles are taken over
+
+    Returns
+    -------
+    handle(request): coroutine
+        returns the response to a request, as a dictionary
+    start(path, host, port): coroutine
+        returns the asyncio server, listening on the Unix socket path or
+        else on a local TCP port
+    serve_forever(path, host, port, ready): None
+        serves until interrupted, calling ready with the address listened
+        on, once listening
+    stats(): dictionary
+        returns queue depth, request and batch counts and latency
+        percentiles, by program and component
+
+    Examples
+    --------
+    >>> import asyncio
+    >>> server = PipelineServer(['samples/example1.ppl'], max_delay=0.01)
+    >>> async def requests():
+    ...   series = {'time': [1, 2, 3], 'data': [1.0, 2.0, 3.0]}
+    ...   run = {'component': 'standardize', 'inputs': [series]}
+    ...   return await asyncio.gather(*[server.handle(dict(run, id=i)) for i in range(4)])
+    >>> [r['result']['data'][0] for r in asyncio.run(requests())]
+    [-1.224744871391589, -1.224744871391589, -1.224744871391589, -1.224744871391589]
+    >>> server.stats()['example1']['standardize']['batches']
+    1
+  """
+  def __init__(self, programs, max_batch=64, max_delay=0.002, series_type=None, window=10000):
+    if not isinstance(programs, dict):
+      programs = collections.OrderedDict((os.path.splitext(os.path.basename(p))[0], Pipeline(p)) for p in programs)
+    if series_type is None:
+      from timeseries import TimeSeries as series_type
+    self.programs = programs
+    self.series_type = series_type
+    self._batchers = collections.OrderedDict() # {(program, component) => _Batcher}
+    for (name,pipeline) in programs.items():
+      for (component,pcode) in pipeline.components.items():
+        self._batchers[(name, component)] = _Batcher(pcode, max_batch, max_delay, window)
+
+  def _decode(self, value):
+    if isinstance(value, dict):
+      return self.series_type(value['time'], value['data'])
+    if isinstance(value, list):
+      return np.array(value)
+    return value
+
+  def _batcher(self, request):
+    program = request.get('program')
+    if program is None:
+      if len(self.programs) != 1:
+        raise ValueError('A program must be given, one of %s' % ', '.join(self.programs))
+      program = next(iter(self.programs))
+    batcher = self._batchers.get((program, request.get('component')))
+    if batcher is None:
+      raise ValueError("No component '%s' in program '%s'" % (request.get('component'), program))
+    return batcher
+
+  async def handle(self, request):
+    response = {'id': request.get('id') if isinstance(request, dict) else None}
+    try:
+      if not isinstance(request, dict):
+        raise TypeError('A request must be a JSON object, not %s' % type(request).__name__)
+      if request.get('stats'):
+        response['stats'] = self.stats()
+        return response
+      batcher = self._batcher(request)
+      args = tuple(self._decode(v) for v in request.get('inputs', []))
+      if len(args) != len(batcher.pcode.inputs):
+        raise TypeError('%s() takes %d input(s) but %d were given' % (batcher.pcode.name, len(batcher.pcode.inputs), len(args)))
+      response['result'] = encode(await batcher.submit(args))
+    except Exception as e:
+      response['error'] = '%s: %s' % (type(e).__name__, e)
+    return response
+
+  def stats(self):
+    result = collections.OrderedDict()
+    for ((program,component),batcher) in self._batchers.items():
+      result.setdefault(program, collections.OrderedDict())[component] = batcher.stats()
+    return result
+
+  def queue_depth(self):
+    'The number of requests waiting for or running in a batch.'
+    return sum(len(b.waiting)+b.running for b in self._batchers.values())
+
+  async def _client(self, reader, writer):
+    lock = asyncio.Lock()
+    tasks = set()
+    async def respond(line):
+      try:
+        response = await self.handle(json.loads(line))
+      except Exception as e:
+        # Every line gets a response, even one which is not valid JSON
+        response = {'id': None, 'error': '%s: %s' % (type(e).__name__, e)}
+      async with lock:
+        writer.write(json.dumps(response).encode()+b'\n')
+        await writer.drain()
+    try:
+      while True:
+        line = await reader.readline()
+        if not line:
+          break
+        # Requests of one client are served concurrently, so they batch too
+        task = asyncio.ensure_future(respond(line))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+      if tasks:
+        await asyncio.wait(tasks)
+    finally:
+      writer.close()
+
+  async def start(self, path=None, host='127.0.0.1', port=0):
+    if path is not None:
+      return await asyncio.start_unix_server(self._client, path, limit=MAX_REQUEST)
+    if host not in LOCAL_HOSTS:
+      raise ValueError('The server only listens on local addresses, not %s' % host)
+    return await asyncio.start_server(self._client, host, port, limit=MAX_REQUEST)
+
+  def serve_forever(self, path=None, host='127.0.0.1', port=0, ready=None):
+    async def serve():
+      server = await self.start(path, host, port)
+      if ready is not None:
+        # Port 0 listens on a port the system picks: clients learn it here
+        ready(server.sockets[0].getsockname())
+      async with server:
+        await server.serve_forever()
+    asyncio.run(serve())
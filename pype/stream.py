@@ -0,0 +1,179 @@
+import tempfile
+
+import numpy as np
+
+from .batch import ARRAY_OPERATORS
+from .lib_import import component_attribute, generic_operator
+
+SERIES = 'series'
+SCALAR = 'scalar'
+
+class StreamPlan(object):
+  """
+    A class that takes a PCode and plans its execution over inputs arriving in
+    chunks: the instructions are split into passes over the stream
+
+    Arithmetic on series is computed chunk by chunk, and reductions with an
+    accumulator (like mean and std) are computed online, their value being known
+    once the pass streaming their argument is over. A series which needs such a
+    value, like (- t mu) in standardize, is therefore streamed in a later pass,
+    over chunks buffered during the first one.
+
+    Parameters
+    ----------
+    pcode: the PCode of a component whose inputs are all series
+
+    Returns
+    -------
+    streamable: bool
+        False if an instruction cannot run chunk by chunk, for instance a
+        library function without an accumulator applied to a series
+    passes: int
+        the number of passes over the input stream
+
+    Examples
+    --------
+    >>> import operator
+    >>> from .pcode import PCode, Instruction
+    >>> p = PCode('c', ['t'], ['z'], {}, [Instruction('z', operator.neg, ('t',))])
+    >>> StreamPlan(p).passes
+    1
+  """
+  def __init__(self, pcode):
+    self.pcode = pcode
+    self.kind = {name:SERIES for name in pcode.inputs}
+    self.kind.update((name,SCALAR) for name in pcode.constants)
+    # The pass a series is streamed in, or the pass from which a scalar is known
+    self.start = {name:0 for name in self.kind}
+    self.accumulators = {} # {instruction index => accumulator factory}
+    self.streamable = True
+    for (i,(dest,func,args)) in enumerate(pcode.instructions):
+      start = max([self.start[a] for a in args] or [0])
+      series_args = [a for a in args if self.kind[a] == SERIES]
+      elementwise = generic_operator(func) in ARRAY_OPERATORS
+      factory = None if elementwise else component_attribute(func, 'accumulator')
+      if not series_args:
+        self.kind[dest] = SCALAR
+      elif elementwise:
+        self.kind[dest] = SERIES
+      elif factory is not None and len(args) == 1:
+        self.kind[dest] = SCALAR
+        self.accumulators[i] = factory
+        start += 1
+      else:
+        self.streamable = False
+        return
+      self.start[dest] = start
+    self.series_outputs = any(self.kind[o] == SERIES for o in pcode.outputs)
+    last = max([self.start[o] for o in pcode.outputs] or [0])
+    self.passes = last+1 if self.series_outputs else last
+    # What to compute in each pass: the series feeding a reduction of that
+    # pass, or an output in the last one
+    self.schedule = []
+    for k in range(self.passes):
+      reductions = [i for i in self.accumulators if self.start[pcode.instructions[i].args[0]] == k]
+      wanted = set(pcode.instructions[i].args[0] for i in reductions)
+      if k == self.passes-1 and self.series_outputs:
+        wanted.update(o for o in pcode.outputs if self.kind[o] == SERIES)
+      series = []
+      for i in reversed(range(len(pcode.instructions))):
+        (dest,func,args) = pcode.instructions[i]
+        if dest in wanted and i not in self.accumulators:
+          series.insert(0, i)
+          wanted.update(a for a in args if self.kind[a] == SERIES)
+      self.schedule.append((series, sorted(reductions)))
+
+class ChunkBuffer(object):
+  '''Keeps the chunks of a stream for later passes, in memory or spilled to a
+  temporary file.'''
+  def __init__(self, spill=False):
+    self._file = tempfile.TemporaryFile() if spill else None
+    self._chunks = []
+    self._types = None
+    self._count = 0
+
+  def append(self, chunk):
+    if self._file is None:
+      self._chunks.append(chunk)
+      return
+    self._types = [type(series) for series in chunk]
+    for series in chunk:
+      np.save(self._file, series.time)
+      np.save(self._file, series.data)
+    self._count += 1
+
+  def __iter__(self):
+    if self._file is None:
+      for chunk in self._chunks:
+        yield chunk
+      return
+    self._file.seek(0)
+    for _ in range(self._count):
+      yield tuple(t(np.load(self._file), np.load(self._file)) for t in self._types)
+
+  def close(self):
+    if self._file is not None:
+      self._file.close()
+    self._chunks = []
+
+def _result(pcode, env):
+  if len(pcode.outputs) == 1:
+    return env[pcode.outputs[0]]
+  return tuple(env[o] for o in pcode.outputs)
+
+def _materialize(pcode, chunks):
+  chunks = list(chunks)
+  if not chunks:
+    raise ValueError('Cannot perform operation on empty stream')
+  inputs = []
+  for j in range(len(pcode.inputs)):
+    series = [chunk[j] for chunk in chunks]
+    inputs.append(type(series[0])(np.concatenate([s.time for s in series]), np.concatenate([s.data for s in series])))
+  yield pcode(*inputs)
+
+def _execute(plan, chunks, spill):
+  pcode = plan.pcode
+  scalars = dict(pcode.constants)
+  def compute_scalars():
+    for (i,(dest,func,args)) in enumerate(pcode.instructions):
+      if plan.kind[dest] == SCALAR and i not in plan.accumulators and dest not in scalars and all(a in scalars for a in args):
+        scalars[dest] = func(*[scalars[a] for a in args])
+  buffer = ChunkBuffer(spill) if plan.passes > 1 else None
+  source = chunks
+  try:
+    for k in range(plan.passes):
+      compute_scalars()
+      series, reductions = plan.schedule[k]
+      accumulators = {i:plan.accumulators[i]() for i in reductions}
+      for chunk in source:
+        if k == 0 and buffer is not None:
+          buffer.append(chunk)
+        env = scalars.copy()
+        env.update(zip(pcode.inputs, chunk))
+        for i in series:
+          (dest,func,args) = pcode.instructions[i]
+          env[dest] = func(*[env[a] for a in args])
+        for i in reductions:
+          accumulators[i].update(env[pcode.instructions[i].args[0]])
+        if k == plan.passes-1 and plan.series_outputs:
+          yield _result(pcode, env)
+      for i in reductions:
+        scalars[pcode.instructions[i].dest] = accumulators[i].result()
+      source = buffer
+    compute_scalars()
+    if not plan.series_outputs:
+      yield _result(pcode, scalars)
+  finally:
+    if buffer is not None:
+      buffer.close()
+
+def run_stream(pcode, chunks, spill=False):
+  '''Runs a PCode over inputs arriving in chunks; see PCode.run_stream.'''
+  if len(pcode.inputs) == 1:
+    chunks = ((chunk,) for chunk in chunks)
+  else:
+    chunks = (tuple(chunk) for chunk in chunks)
+  plan = pcode.stream_plan()
+  if not plan.streamable:
+    return _materialize(pcode, chunks)
+  return _execute(plan, chunks, spill)
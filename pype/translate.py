@@ -1,20 +1,80 @@
 from .ast import *
 from .symtab import *
 from .lib_import import LibraryImporter
+from .fgir import *
+import numbers
+import operator
+
+# The arithmetic expressions of the language are parsed into calls of these
+# names; they are builtins of PyPE rather than library symbols.
+OPERATORS = {
+  '__add__': operator.add,
+  '__sub__': operator.sub,
+  '__mul__': operator.mul,
+  '__truediv__': operator.truediv,
+}
+
+# Type names understood without an import
+BUILTIN_TYPES = {
+  'Scalar': numbers.Real,
+}
 
 class SymbolTableVisitor(ASTVisitor):
   def __init__(self):
     self.symbol_table = SymbolTable()
     self._component = None
+    self._importers = []
+    self._referenced = [] # Called names, not yet looked up in the imports
+    self._imported = set() # Names resolved from an import
+    self._typed = [] # (component, input, type name) of typed inputs
 
   def return_value(self):
+    self._resolve_references()
     return self.symbol_table
 
+  def _resolve_references(self):
+    # Only the library symbols a program calls go into the symbol table; the
+    # latest import defining a name wins.
+    globals_ = self.symbol_table['global']
+    for name in self._referenced:
+      if name in globals_:
+        continue
+      for imp in reversed(self._importers):
+        sym = imp.lookup(name)
+        if sym is not None:
+          self.symbol_table.addsym(sym)
+          self._imported.add(name)
+          break
+    self._referenced = []
+    # Typed inputs have their type as ref
+    for (component,name,typename) in self._typed:
+      t = self._resolve_type(typename)
+      if t is None:
+        raise SyntaxError("Unknown type '%s' of input '%s' in component '%s'"%(typename,name,component))
+      self.symbol_table.addsym(Symbol(name, SymbolType.input, t), component)
+    self._typed = []
+
+  def _resolve_type(self, typename):
+    if typename in BUILTIN_TYPES:
+      return BUILTIN_TYPES[typename]
+    for imp in reversed(self._importers):
+      t = getattr(imp.mod, typename, None)
+      if isinstance(t, type):
+        return t
+    return None
+
   def visit(self, node):
     if isinstance(node, ASTImport):
       # Import statements make library functions available to PyPE
       imp = LibraryImporter(node.module)
-      imp.add_symbols(self.symbol_table)
+      self._importers.append(imp)
+      for name in self._imported:
+        sym = imp.lookup(name)
+        if sym is not None:
+          self.symbol_table.addsym(sym)
+
+    if isinstance(node, ASTEvalExpr) and node.op.name not in OPERATORS:
+      self._referenced.append(node.op.name)
 
     if isinstance(node, ASTComponent):
       self.symbol_table.addsym(Symbol(node.name, SymbolType.component, None))
@@ -28,4 +88,107 @@ class SymbolTableVisitor(ASTVisitor):
       if len(node.children) > 0:
         for child in node.children:
           self.symbol_table.addsym(Symbol(child.name, SymbolType.input, None), self._component)
+          if child.type is not None:
+            self._typed.append((self._component, child.name, child.type))
+
+
+class LoweringVisitor(ASTModVisitor):
+  """
+    A visitor which lowers a checked AST to a FGIR, the dataflow graph of
+    each component; variable references are resolved once the whole component
+    is seen, since assignments may appear in any order
+
+    Parameters
+    ----------
+    symtab: the SymbolTable built by SymbolTableVisitor
+
+    Examples
+    --------
+    >>> c = ASTComponent('c', [ASTOutputExpr([ASTID('y')]), ASTInputExpr([ASTID('x')]),
+    ...                        ASTAssignmentExpr('y', ASTEvalExpr(ASTID('__add__'), [ASTID('x'), ASTLiteral(1)]))])
+    >>> ir = ASTProgram([c]).mod_walk(LoweringVisitor(SymbolTable()))
+    >>> print(ir['c'].pprint())
+    c
+      FGNode(@1, input, 'x', [])
+      FGNode(@2, literal, 1, [])
+      FGNode(@3, operator, add, [@1, @2])
+      FGNode(@4, assignment, 'y', [@3])
+      FGNode(@0, output, 'y', [@4])
+  """
+  def __init__(self, symtab):
+    self.symtab = symtab
+    self.ir = FGIR()
+    self._graph = None
+
+  def visit(self, node):
+    if isinstance(node, ASTComponent):
+      self._graph = Flowgraph(node.name)
+    return node
+
+  def post_visit(self, node, visit_value, child_values):
+    if isinstance(node, ASTProgram):
+      return self.ir
+    if isinstance(node, ASTComponent):
+      self._resolve_variables()
+      self.ir[node.name] = self._graph
+      return self._graph
+    if isinstance(node, ASTID):
+      # A variable reference, resolved at the end of the component
+      return node.name
+    if isinstance(node, ASTLiteral):
+      return self._graph.new_node(FGNodeType.literal, node.value).nodeid
+    if isinstance(node, ASTEvalExpr):
+      return self._lower_call(node.op.name, child_values[1:], node.position)
+    if isinstance(node, ASTAssignmentExpr):
+      n = self._graph.new_node(FGNodeType.assignment, node.binding.name, [child_values[1]])
+      self._graph.variables[node.binding.name] = n.nodeid
+      return n.nodeid
+    if isinstance(node, ASTInputExpr):
+      for child in node.children:
+        n = self._graph.new_node(FGNodeType.input, child.name)
+        self._graph.variables[child.name] = n.nodeid
+    if isinstance(node, ASTOutputExpr):
+      for child in node.children:
+        self._graph.new_node(FGNodeType.output, child.name, [child.name])
+    return None
+
+  def _lower_call(self, opname, args, position=None):
+    # Every node the call lowers to maps back to the expression
+    first = self._graph._counter
+    nodeid = self._lower_function(opname, args)
+    for i in range(first, self._graph._counter):
+      self._graph.nodes['@%d' % i].position = position
+    return nodeid
+
+  def _lower_function(self, opname, args):
+    if opname in OPERATORS:
+      # Arithmetic is variadic in PyPE: (- x) negates, (+ a b c) folds left.
+      if len(args) == 1 and opname == '__sub__':
+        return self._graph.new_node(FGNodeType.operator, operator.neg, args).nodeid
+      if len(args) == 1 and opname == '__add__':
+        return args[0]
+      if len(args) < 2:
+        raise SyntaxError("Operator '%s' needs two or more arguments in component '%s'"%(opname,self._graph.name))
+      acc = args[0]
+      for arg in args[1:]:
+        acc = self._graph.new_node(FGNodeType.operator, OPERATORS[opname], [acc,arg]).nodeid
+      return acc
+    sym = self.symtab['global'].get(opname)
+    if sym is None:
+      raise SyntaxError("Undefined function '%s' in component '%s'"%(opname,self._graph.name))
+    if sym.type == SymbolType.libraryfunction:
+      return self._graph.new_node(FGNodeType.libraryfunction, sym.ref, args).nodeid
+    if sym.type == SymbolType.librarymethod:
+      return self._graph.new_node(FGNodeType.librarymethod, sym.ref, args).nodeid
+    if sym.type == SymbolType.component:
+      # Calls of the program's own components are inlined once all are lowered
+      return self._graph.new_node(FGNodeType.component, opname, args).nodeid
+    raise SyntaxError("Cannot call %s '%s' in component '%s'"%(sym.type.name,opname,self._graph.name))
 
+  def _resolve_variables(self):
+    for n in self._graph.nodes.values():
+      for (i,ref) in enumerate(n.inputs):
+        if ref not in self._graph.nodes:
+          if ref not in self._graph.variables:
+            raise SyntaxError("Undefined variable '%s' in component '%s'"%(ref,self._graph.name))
+          n.inputs[i] = self._graph.variables[ref]
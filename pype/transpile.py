@@ -0,0 +1,126 @@
+import keyword
+import operator
+import re
+
+# Operators are written as Python expressions rather than calls
+INFIX = {
+  operator.add: '{} + {}',
+  operator.sub: '{} - {}',
+  operator.mul: '{} * {}',
+  operator.truediv: '{} / {}',
+  operator.neg: '-{}',
+}
+
+IDENTIFIER_RE = re.compile(r'^[a-zA-Z_][a-zA-Z_0-9]*$')
+
+def _reference(func):
+  '''Returns the module to import func from, the top-level name to import and
+  the dotted path of func from the module.'''
+  module = getattr(func, '__module__', None)
+  qualname = getattr(func, '__qualname__', None)
+  if not module or not qualname or '<locals>' in qualname or '<lambda>' in qualname:
+    raise ValueError("Cannot refer to %r from generated code" % (func,))
+  head = qualname.split('.')[0]
+  return module, head, qualname
+
+class PythonGenerator(object):
+  """
+    A class that takes the PCodes of a program and generates an equivalent
+    plain Python module, with one function per component: straight-line code
+    calling the resolved library functions, which needs neither the lexer, the
+    parser nor a symbol table to run
+
+    Parameters
+    ----------
+    pcodes: a dictionary from component names to PCode objects
+    source: the name of the .ppl file, for the header comment
+
+    Returns
+    -------
+    generate(): string
+        returns the source of the module
+
+    Examples
+    --------
+    >>> from .pcode import PCode, Instruction
+    >>> p = PCode('c', ['x'], ['y'], {'%0':2}, [Instruction('%1', operator.mul, ('x','%0')),
+    ...                                         Instruction('y', operator.neg, ('%1',))])
+    >>> print(PythonGenerator({'c':p}).generate())
+    # Generated by pype; do not edit.
+    <BLANKLINE>
+    __all__ = ['c']
+    <BLANKLINE>
+    def c(x):
+        _t1 = x * 2
+        y = -_t1
+        return y
+    <BLANKLINE>
+  """
+  def __init__(self, pcodes, source=None):
+    self.pcodes = pcodes
+    self.source = source
+
+  def generate(self):
+    imports = {} # {(module, head) => name used in the generated code}
+    for pcode in self.pcodes.values():
+      for ins in pcode.instructions:
+        if ins.func not in INFIX:
+          module, head, _ = _reference(ins.func)
+          imports[(module,head)] = head
+    # Two imports of the same name from different modules
+    used = set()
+    for (module,head) in sorted(imports):
+      name = head
+      while name in used or name in self.pcodes:
+        name = '_'+name
+      imports[(module,head)] = name
+      used.add(name)
+    lines = ['# Generated by pype%s; do not edit.' % (' from %s' % self.source if self.source else '')]
+    if imports:
+      lines.append('')
+    for ((module,head),name) in sorted(imports.items()):
+      if name == head:
+        lines.append('from %s import %s' % (module, head))
+      else:
+        lines.append('from %s import %s as %s' % (module, head, name))
+    lines.append('')
+    lines.append('__all__ = [%s]' % ', '.join(repr(self._function_name(c)) for c in self.pcodes))
+    for pcode in self.pcodes.values():
+      lines.append('')
+      lines.extend(self._function(pcode, imports, used))
+    return '\n'.join(lines)+'\n'
+
+  def _function_name(self, name):
+    return name+'_' if keyword.iskeyword(name) else name
+
+  def _function(self, pcode, imports, reserved):
+    names = {}
+    taken = set(reserved) | set(self._function_name(c) for c in self.pcodes)
+    def local(name):
+      if name not in names:
+        candidate = name if IDENTIFIER_RE.match(name) and not keyword.iskeyword(name) else '_t'+name.lstrip('%')
+        while candidate in taken:
+          candidate = '_'+candidate
+        names[name] = candidate
+        taken.add(candidate)
+      return names[name]
+    def value(name):
+      if name in pcode.constants:
+        return repr(pcode.constants[name])
+      return local(name)
+    params = [local(i) for i in pcode.inputs]
+    lines = ['def %s(%s):' % (self._function_name(pcode.name), ', '.join(params))]
+    for (dest,func,args) in pcode.instructions:
+      argv = [value(a) for a in args]
+      if func in INFIX:
+        expr = INFIX[func].format(*argv)
+      else:
+        module, head, qualname = _reference(func)
+        expr = '%s(%s)' % (imports[(module,head)]+qualname[len(head):], ', '.join(argv))
+      lines.append('    %s = %s' % (local(dest), expr))
+    outputs = [value(o) for o in pcode.outputs]
+    if len(outputs) == 1:
+      lines.append('    return %s' % outputs[0])
+    else:
+      lines.append('    return (%s)' % ', '.join(outputs))
+    return lines
@@ -0,0 +1,101 @@
+import numbers
+import operator
+import sys
+
+from .fgir import *
+from .symtab import *
+from .component import return_type, find_kernel, has_kernels
+from .optimize import FlowgraphOptimization
+
+SYMBOLS = {operator.add:'+', operator.sub:'-', operator.mul:'*', operator.truediv:'/', operator.neg:'-'}
+
+def type_name(t):
+  return 'Scalar' if t is numbers.Real else t.__name__
+
+def _owner(method):
+  'Returns the class a method was defined in, or None.'
+  qualname = getattr(method, '__qualname__', '')
+  if '<locals>' in qualname or '.' not in qualname:
+    return None
+  obj = sys.modules.get(getattr(method, '__module__', None))
+  for part in qualname.split('.')[:-1]:
+    obj = getattr(obj, part, None)
+  return obj if isinstance(obj, type) else None
+
+class TypeInference(FlowgraphOptimization):
+  """
+    A flowgraph pass which propagates the declared types of inputs, of literals
+    and of what components return through every node. Operators whose operand
+    types are known are bound to the kernel declared for those types, instead
+    of the generic operator dispatching at runtime; programs applying an
+    operator or a method to operands of the wrong type are rejected.
+
+    Nodes whose type cannot be inferred, like undeclared inputs, are typed
+    None and run as before.
+
+    Parameters
+    ----------
+    symtab: the SymbolTable built by SymbolTableVisitor, whose typed inputs
+        have their type as ref
+
+    Returns
+    -------
+    visit(flowgraph): flowgraph
+        returns the flowgraph, with specialized operator nodes and its types
+        as flowgraph.types, a dictionary from node ids to types
+
+    Examples
+    --------
+    >>> fg = Flowgraph('c')
+    >>> x = fg.new_node(FGNodeType.input, 'x')
+    >>> one = fg.new_node(FGNodeType.literal, 1)
+    >>> add = fg.new_node(FGNodeType.operator, operator.add, [x.nodeid, one.nodeid])
+    >>> out = fg.new_node(FGNodeType.output, 'y', [add.nodeid])
+    >>> symtab = SymbolTable()
+    >>> symtab.addscope('c')
+    >>> symtab.addsym(Symbol('x', SymbolType.input, numbers.Real), 'c')
+    >>> type_name(TypeInference(symtab).visit(fg).types[out.nodeid])
+    'Scalar'
+  """
+  def __init__(self, symtab):
+    super().__init__()
+    self.symtab = symtab
+
+  def visit(self, flowgraph):
+    types = {}
+    scope = self.symtab[flowgraph.name] if flowgraph.name in self.symtab.scopes() else {}
+    for nodeid in flowgraph.topological_sort():
+      n = flowgraph.nodes[nodeid]
+      argtypes = [types[i] for i in n.inputs]
+      if n.type == FGNodeType.input:
+        sym = scope.get(n.ref)
+        types[nodeid] = sym.ref if sym is not None and isinstance(sym.ref, type) else None
+      elif n.type == FGNodeType.literal:
+        types[nodeid] = numbers.Real if isinstance(n.ref, numbers.Real) else type(n.ref)
+      elif n.type in (FGNodeType.assignment, FGNodeType.output):
+        types[nodeid] = argtypes[0]
+      elif n.type == FGNodeType.operator:
+        types[nodeid] = self._operator(flowgraph, n, argtypes)
+      else:
+        if n.type == FGNodeType.librarymethod and argtypes and argtypes[0] is not None:
+          owner = _owner(n.ref)
+          if owner is not None and not issubclass(argtypes[0], owner):
+            raise SyntaxError("Type error in component '%s': %s expects a %s, not a %s"
+                              % (flowgraph.name, n.ref.__name__, type_name(owner), type_name(argtypes[0])))
+        types[nodeid] = return_type(n.ref)
+    flowgraph.types = types
+    return flowgraph
+
+  def _operator(self, flowgraph, n, argtypes):
+    if None in argtypes:
+      return None
+    if all(issubclass(t, numbers.Real) for t in argtypes):
+      return numbers.Real
+    found = find_kernel(n.ref, argtypes)
+    if found is not None:
+      n.ref, result = found
+      return result
+    if any(not issubclass(t, numbers.Real) and has_kernels(n.ref, t) for t in argtypes):
+      raise SyntaxError("Type error in component '%s': unsupported operand types for %s: %s"
+                        % (flowgraph.name, SYMBOLS.get(n.ref, n.ref), ', '.join(type_name(t) for t in argtypes)))
+    return None
@@ -1,9 +1,18 @@
 import unittest
 import pype
+import pype.cli
 import timeseries
 import io
+import tempfile
+import numpy as np
 import sys
-from contextlib import redirect_stdout
+import os
+import subprocess
+from contextlib import redirect_stdout, redirect_stderr
+
+# Seconds that importing timeseries (and so pype) may take, numpy aside: a
+# generous bound, as what is imported is checked directly
+IMPORT_BUDGET = 1.0
 
 class MyTest(unittest.TestCase):
 
@@ -96,5 +105,657 @@ class MyTest(unittest.TestCase):
             print(b)
         self.assertEqual(pype.is_component(sillyfunc2), False)
 
+    def test_pipeline_run(self):
+        standardize = pype.Pipeline("samples/example1.ppl")['standardize']
+        ts = timeseries.TimeSeries([1,2,3,4],[1.,2.,3.,6.])
+        result = standardize(ts)
+        expected = (ts.data-ts.data.mean())/ts.data.std()
+        self.assertListEqual(result.times(), [1,2,3,4])
+        self.assertTrue(np.allclose(result.data, expected))
+        self.assertEqual(len(standardize.instructions), 4)
+
+    def test_pipeline_errors(self):
+        sources = {
+            'undefined': '{ c (input x) (output y) }',
+            'circular': '{ c (input x) (:= a (+ b x)) (:= b (+ a x)) (output a) }',
+            'function': '(import timeseries) { c (input x) (:= y (nosuchfunc x)) (output y) }',
+        }
+        for name,source in sources.items():
+            with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+                f.write(source)
+                f.flush()
+                with self.assertRaises(SyntaxError):
+                    pype.Pipeline(f.name)
+
+    def test_deadcode(self):
+        source = """(import timeseries)
+        { standardize
+        (:= new_t (/ (- t mu) sig))
+        (:= unused (* (- t mu) 2))
+        (:= mu (mean t))
+        (:= sig (std t))
+        (:= scratch (std unused))
+        (input (TimeSeries t))
+        (output new_t)
+        }"""
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write(source)
+            f.flush()
+            pipeline = pype.Pipeline(f.name)
+        removed = sorted(m for (c,m) in pipeline.optimizations if m.startswith('removed'))
+        self.assertListEqual(removed, ["removed unused binding 'scratch'","removed unused binding 'unused'"])
+        graph = pipeline.ir['standardize']
+        self.assertEqual(len(graph.nodes), 10)
+        order = graph.topological_sort()
+        for nodeid in order:
+            for i in graph.pre(nodeid):
+                self.assertLess(order.index(i), order.index(nodeid))
+        self.assertIn('digraph standardize', graph.dotfile())
+        self.assertEqual(len(pipeline['standardize'].instructions), 4)
+
+    def test_optimizations(self):
+        source = """(import timeseries)
+        { scale
+        (input (TimeSeries t))
+        (:= a (/ (- t (mean t)) (std t)))
+        (:= b (* (- t (mean t)) (+ 1 (* 2 3))))
+        (output a b)
+        }"""
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write(source)
+            f.flush()
+            optimized = pype.Pipeline(f.name)
+            plain = pype.Pipeline(f.name, constant_folding=False, subexpression_elimination=False)
+        self.assertIn(('scale','folded (+ 1 6) to 7'), optimized.optimizations)
+        self.assertIn(('scale',"bound (- t (mean t)) to '_cse0' for 2 uses"), optimized.optimizations)
+        self.assertListEqual(plain.optimizations, [])
+        self.assertEqual(len(optimized['scale'].instructions), 5)
+        self.assertEqual(len(plain['scale'].instructions), 9)
+        ts = timeseries.TimeSeries([1,2,3,4],[1.,2.,3.,6.])
+        for (x,y) in zip(optimized['scale'](ts), plain['scale'](ts)):
+            self.assertTrue(np.allclose(x.data, y.data))
+
+    def test_parallel(self):
+        pipeline = pype.Pipeline("samples/example1.ppl")
+        ts = timeseries.TimeSeries(list(range(1000)),np.random.rand(1000))
+        expected = pipeline['standardize'](ts)
+        with pipeline.parallel('standardize', workers=4) as standardize:
+            for i in range(20):
+                self.assertTrue(np.array_equal(standardize(ts).data, expected.data))
+        # An executor which is never shut down stops its threads once dropped
+        standardize = pipeline.parallel('standardize', workers=4)
+        self.assertTrue(np.array_equal(standardize(ts).data, expected.data))
+        pool = standardize._pool # Even while something else still refers to its pool
+        threads = list(pool._threads)
+        del standardize
+        import gc
+        gc.collect()
+        for thread in threads:
+            thread.join(5)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+
+    def test_threadsafe(self):
+        @pype.component(threadsafe=False)
+        def unsafe(a):
+            return a
+        @pype.component
+        def safe(a):
+            return a
+        self.assertTrue(pype.is_component(unsafe))
+        self.assertFalse(pype.is_threadsafe(unsafe))
+        self.assertTrue(pype.is_threadsafe(safe))
+
+    def test_run_batch(self):
+        standardize = pype.Pipeline("samples/example1.ppl")['standardize']
+        times = list(range(100))
+        shared = [timeseries.TimeSeries(times,np.random.rand(100)) for i in range(50)]
+        ragged = [timeseries.TimeSeries(list(range(i,i+10)),np.random.rand(10)) for i in range(5)]
+        for batch in (shared, ragged):
+            results = standardize.run_batch(batch)
+            self.assertEqual(len(results), len(batch))
+            for (ts,result) in zip(batch, results):
+                self.assertIsInstance(result, timeseries.TimeSeries)
+                self.assertListEqual(result.times(), ts.times())
+                self.assertTrue(np.allclose(result.data, standardize(ts).data))
+        self.assertListEqual(standardize.run_batch([]), [])
+        with self.assertRaises(ValueError):
+            standardize.run_batch([timeseries.TimeSeries([],[])]*2)
+
+    def test_run_stream(self):
+        source = """(import timeseries)
+        { moments
+        (input (TimeSeries t))
+        (:= mu (mean t))
+        (:= var (* (std t) (std t)))
+        (output mu var)
+        }"""
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write(source)
+            f.flush()
+            moments = pype.Pipeline(f.name)['moments']
+        standardize = pype.Pipeline("samples/example1.ppl")['standardize']
+        ts = timeseries.TimeSeries(list(range(1000)),np.random.rand(1000))
+        chunks = lambda: (timeseries.TimeSeries(ts.time[i:i+64],ts.data[i:i+64]) for i in range(0,1000,64))
+        self.assertEqual(standardize.stream_plan().passes, 2)
+        for spill in (False, True):
+            results = list(standardize.run_stream(chunks(), spill=spill))
+            self.assertEqual(len(results), 16)
+            self.assertTrue(np.array_equal(np.concatenate([r.time for r in results]), ts.time))
+            self.assertTrue(np.allclose(np.concatenate([r.data for r in results]), standardize(ts).data))
+        [(mu,var)] = list(moments.run_stream(chunks()))
+        self.assertTrue(np.allclose([mu,var], [ts.mean(),ts.std()**2]))
+
+    def test_compile_cache(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = pype.CompileCache(d)
+            first = pype.Pipeline("samples/example1.ppl", cache=cache)
+            second = pype.Pipeline("samples/example1.ppl", cache=cache)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            ts = timeseries.TimeSeries([1,2,3,4],[1.,2.,3.,6.])
+            self.assertTrue(np.array_equal(first['standardize'](ts).data, second['standardize'](ts).data))
+            self.assertEqual(len(second.symbols['standardize']), 4)
+            # Other options, or other source, are other programs
+            pype.Pipeline("samples/example1.ppl", cache=cache, constant_folding=False)
+            pype.Pipeline("samples/example0.ppl", cache=cache)
+            self.assertEqual(cache.misses, 3)
+            self.assertEqual(len(cache.entries()), 3)
+            size = max(size for (_,size,_) in cache.entries())
+            cache.max_size = size
+            cache.evict()
+            self.assertEqual(len(cache.entries()), 1)
+
+    def test_cache_key_sources(self):
+        # Editing the module declaring a component, not only the package
+        # imported, or pype itself, makes another key
+        with tempfile.TemporaryDirectory() as d:
+            os.mkdir(os.path.join(d, 'cachelib'))
+            with open(os.path.join(d, 'cachelib', '__init__.py'), 'w') as f:
+                f.write('from .impl import *\n')
+            impl = os.path.join(d, 'cachelib', 'impl.py')
+            with open(impl, 'w') as f:
+                f.write('import pype\n@pype.component\ndef ident(x):\n    return x\n')
+            sys.path.insert(0, d)
+            try:
+                cache = pype.CompileCache(d)
+                source = '(import cachelib) { c (input x) (:= y (ident x)) (output y) }'
+                key = cache.key(source, ())
+                self.assertEqual(cache.key(source, ()), key)
+                st = os.stat(impl)
+                os.utime(impl, ns=(st.st_atime_ns, st.st_mtime_ns+10**9))
+                self.assertNotEqual(cache.key(source, ()), key)
+            finally:
+                sys.path.remove(d)
+                sys.modules.pop('cachelib', None)
+                sys.modules.pop('cachelib.impl', None)
+        self.assertIn('timeseries.timeseries', [s[0] for s in pype.cache.module_version('timeseries')[1:]])
+        self.assertIn('pipeline.py', [s[0] for s in pype.cache.pype_version()])
+
+    def test_transpile(self):
+        with tempfile.TemporaryDirectory() as d:
+            output = d+'/example1_ppl.py'
+            self.assertEqual(pype.cli.main(['compile', 'samples/example1.ppl', '-o', output]), 0)
+            source = open(output).read()
+            self.assertNotIn('pype', source.split('\n',1)[1])
+            namespace = {}
+            exec(compile(source, output, 'exec'), namespace)
+        ts = timeseries.TimeSeries([1,2,3,4],[1.,2.,3.,6.])
+        expected = pype.Pipeline("samples/example1.ppl")['standardize'](ts)
+        self.assertTrue(np.array_equal(namespace['standardize'](ts).data, expected.data))
+        self.assertEqual(pype.cli.main(['compile', 'samples/nosuchfile.ppl']), 1)
+
+    def test_import_time(self):
+        # Importing pype loads neither the compiler nor numpy
+        code = "import sys, pype; print(','.join(m for m in ('ply', 'numpy', 'pype.parser') if m in sys.modules))"
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(subprocess.check_output([sys.executable, '-c', code], cwd=root).strip(), b'')
+        # nor does importing timeseries load the compiler; numpy is imported first
+        code = ("import time, numpy; t = time.perf_counter(); import timeseries; t = time.perf_counter()-t\n"
+                "import sys; print(t, any(m in sys.modules for m in ('ply', 'pype.parser', 'pype.pipeline')))")
+        elapsed, compiler = subprocess.check_output([sys.executable, '-c', code], cwd=root).split()
+        self.assertEqual(compiler, b'False')
+        self.assertLess(float(elapsed), IMPORT_BUDGET)
+        # Compiling reads the prebuilt tables and writes nothing
+        tables = os.path.join(root, 'pype', 'parsetab.py')
+        mtime = os.stat(tables).st_mtime
+        subprocess.check_call([sys.executable, '-c', 'import pype; pype.Pipeline("samples/example1.ppl")'], cwd=root)
+        self.assertEqual(os.stat(tables).st_mtime, mtime)
+        self.assertFalse(os.path.exists(os.path.join(root, 'pype', 'parser.out')))
+
+    def test_version(self):
+        # Without importlib.metadata (before Python 3.8), pkg_resources finds versions
+        code = ("import sys; sys.modules['importlib.metadata'] = sys.modules['importlib_metadata'] = None\n"
+                "import pype, timeseries; pype.__name__ = 'numpy'; import numpy\n"
+                "print(pype._version() == numpy.__version__, timeseries.__version__)")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        found, version = subprocess.check_output([sys.executable, '-c', code], cwd=root).split()
+        self.assertEqual(found, b'True')
+        self.assertTrue(version)
+
+    def test_concurrent_compile(self):
+        # Each compilation has its own lexer and parser state
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            pipelines = list(pool.map(pype.Pipeline, ["samples/example1.ppl"]*32))
+        ts = timeseries.TimeSeries([1,2,3,4],[1.,2.,3.,6.])
+        expected = pype.Pipeline("samples/example1.ppl")['standardize'](ts)
+        for p in pipelines:
+            self.assertTrue(np.allclose(p['standardize'](ts).data, expected.data))
+        with self.assertRaises(SyntaxError):
+            pype.parser.parse('{ c (input x) (output x) ')
+        with self.assertRaises(SyntaxError):
+            pype.parser.parse('{ c (input x) (output x) ) }')
+
+    def test_compile_many(self):
+        with tempfile.TemporaryDirectory() as d:
+            for (name,source) in [('a', '{ a (input x) (output x) }'),
+                                  ('b', '{ b (input x) (:= y (- x)) (output y) }'),
+                                  ('bad', '{ bad (input x) (output y) }'),
+                                  ('noimport', '(import nosuchmodule) { c (input x) (output x) }')]:
+                with open(os.path.join(d, name+'.ppl'), 'w') as f:
+                    f.write(source)
+            for workers in (1, 2):
+                results = pype.compile_many(d, workers=workers)
+                self.assertEqual([os.path.basename(p) for p in results], ['a.ppl', 'b.ppl', 'bad.ppl', 'noimport.ppl'])
+                self.assertEqual(results[os.path.join(d, 'b.ppl')].pipeline['b'](3), -3)
+                self.assertIsNone(results[os.path.join(d, 'a.ppl')].error)
+                bad = results[os.path.join(d, 'bad.ppl')]
+                self.assertIsNone(bad.pipeline)
+                self.assertIsInstance(bad.error, SyntaxError)
+                # Failing imports too, whatever the number of workers
+                self.assertIsInstance(results[os.path.join(d, 'noimport.ppl')].error, ImportError)
+            with redirect_stderr(io.StringIO()):
+                self.assertEqual(pype.cli.main(['compile', os.path.join(d, 'noimport.ppl')]), 1)
+
+    def test_component_registry(self):
+        from pype.lib_import import component_index
+        index = component_index('timeseries')
+        self.assertIs(component_index('timeseries'), index)
+        self.assertIs(index.methods['TimeSeries']['mean'], timeseries.TimeSeries.mean)
+        # Only the library symbols a program calls are resolved
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write('(import timeseries) { c (input t) (:= m (mean t)) (output m) }')
+            f.flush()
+            symbols = pype.Pipeline(f.name).symbols
+        self.assertEqual(sorted(symbols['global']), ['c', 'mean'])
+        # Declaring a component makes the index stale
+        @pype.component
+        def newfunc(x):
+            return x
+        self.assertIsNot(component_index('timeseries'), index)
+
+    def test_deep_program(self):
+        # Deeper than the recursion limit: traversals use explicit stacks
+        depth = 2*sys.getrecursionlimit()
+        source = '{ c (input x) (:= y ' + '(+ 1 '*depth + 'x' + ')'*depth + ') (output y) }'
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write(source)
+            f.flush()
+            self.assertEqual(pype.Pipeline(f.name)['c'](1), depth+1)
+        # Twice, so that subexpression elimination binds and reports it
+        deep = '(+ 1 '*depth + 'x' + ')'*depth
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write('{ c (input x) (:= y %s) (:= z %s) (:= w (+ y z)) (output w) }' % (deep, deep))
+            f.flush()
+            self.assertEqual(pype.Pipeline(f.name)['c'](1), 2*(depth+1))
+        # Semantic checks and the symbol table in one traversal
+        ast = pype.parser.parse(open("samples/example1.ppl").read())
+        check, symtab = ast.walk(pype.ast.MultiVisitor(pype.semantic_analysis.CheckSingleAssignment(),
+                                                       pype.translate.SymbolTableVisitor()))
+        self.assertEqual(check, None)
+        self.assertEqual(sorted(symtab['standardize']), ['mu', 'new_t', 'sig', 't'])
+
+    def test_compact_ast(self):
+        ast = pype.parser.parse(open("samples/example1.ppl").read())
+        nodes = []
+        class Collect(pype.ast.ASTVisitor):
+            def visit(self, node):
+                nodes.append(node)
+        ast.walk(Collect())
+        for node in nodes:
+            self.assertFalse(hasattr(node, '__dict__'))
+            self.assertIsInstance(node.children, tuple)
+        names = [n.name for n in nodes if isinstance(n, pype.ast.ASTID) and n.name == 't']
+        self.assertGreater(len(names), 1)
+        self.assertTrue(all(name is names[0] for name in names))
+
+    def test_reload(self):
+        source = """(import timeseries)
+{ a (input x) (:= y (* x 2)) (output y) }
+# b and c are left alone by the edits below
+{ b (input t) (:= m (mean t)) (output m) }
+{ c (input x) (:= y (+ x 1)) (output y) }
+"""
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write(source)
+            f.flush()
+            pipeline = pype.Pipeline(f.name)
+            b, c = pipeline['b'], pipeline['c']
+            def edit(new):
+                f.seek(0)
+                f.truncate()
+                f.write(new)
+                f.flush()
+                return pipeline.reload()
+            self.assertEqual(edit(source.replace('(* x 2)', '(* x 3)')), ['a'])
+            self.assertEqual(pipeline['a'](2), 6)
+            self.assertIs(pipeline['b'], b)
+            self.assertIs(pipeline['c'], c)
+            self.assertEqual(list(pipeline.components), ['a', 'b', 'c'])
+            # A syntax error leaves the pipeline as it was, on the right line
+            with self.assertRaisesRegex(SyntaxError, 'line 2'):
+                edit(source.replace('(* x 2)', '(* x $)'))
+            self.assertEqual(pipeline['a'](2), 6)
+            # Removing a component, and changing the imports
+            self.assertEqual(edit(source.replace('{ c (input x) (:= y (+ x 1)) (output y) }', '')), ['a'])
+            self.assertEqual(list(pipeline.components), ['a', 'b'])
+            self.assertNotIn('c', pipeline.symbols['global'])
+            self.assertEqual(edit('(import timeseries)\n'+source), ['a', 'b', 'c'])
+
+    def test_type_inference(self):
+        pipeline = pype.Pipeline("samples/example1.ppl")
+        funcs = [ins.func for ins in pipeline['standardize'].instructions]
+        self.assertIn(timeseries.timeseries._sub_series_scalar, funcs)
+        self.assertIn(timeseries.timeseries._div_series_scalar, funcs)
+        graph = pipeline.ir['standardize']
+        self.assertIs(graph.types[graph.outputs[0]], timeseries.TimeSeries)
+        sources = {
+            'method': '(import timeseries) { c (input (Scalar x)) (:= m (mean x)) (output m) }',
+            'type': '(import timeseries) { c (input (Series x)) (output x) }',
+        }
+        for name,source in sources.items():
+            with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+                f.write(source)
+                f.flush()
+                with self.assertRaises(SyntaxError):
+                    pype.Pipeline(f.name)
+        # Untyped inputs keep the generic operators
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write('{ c (input x) (:= y (* x 2)) (output y) }')
+            f.flush()
+            self.assertEqual(pype.Pipeline(f.name)['c'].instructions[0].func.__name__, 'mul')
+
+    def test_memory_planning(self):
+        import tracemalloc
+        source = """(import timeseries)
+        { chain (input (TimeSeries t))
+        (:= a (* t 2)) (:= b (+ a 1)) (:= c (- b 3)) (:= d (/ c 4)) (:= e (* d 5))
+        (output e b) }"""
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write(source)
+            f.flush()
+            chain = pype.Pipeline(f.name)['chain']
+        ts = timeseries.TimeSeries(np.arange(200000), np.random.rand(200000))
+        data = ts.data.copy()
+        tracemalloc.start()
+        e, b = chain(ts)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertTrue(np.allclose(e.data, (((data*2+1)-3)/4)*5))
+        self.assertTrue(np.allclose(b.data, data*2+1))
+        self.assertTrue(np.array_equal(ts.data, data)) # Inputs are never overwritten
+        # Intermediates are freed or reused: far from one buffer per binding
+        self.assertLess(peak, 6*data.nbytes)
+        # A buffer is only reused for results of its own dtype
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write('(import timeseries) { third (input (TimeSeries t)) (:= a (* t 2)) (:= b (/ a 3)) (output b) }')
+            f.flush()
+            third = pype.Pipeline(f.name)['third']
+        self.assertTrue(np.allclose(third(timeseries.TimeSeries([1,2],[1,2])).data, [2/3., 4/3.]))
+
+    def test_buffer_aliasing(self):
+        # A function may return its argument: a value passed to one is never
+        # recycled as the buffer of a later kernel
+        with tempfile.TemporaryDirectory() as tmp:
+            os.mkdir(os.path.join(tmp, 'aliaslib'))
+            with open(os.path.join(tmp, 'aliaslib', '__init__.py'), 'w') as f:
+                f.write('import pype\n@pype.component\ndef ident(x):\n    return x\n')
+            with open(os.path.join(tmp, 'alias.ppl'), 'w') as f:
+                f.write("""(import timeseries) (import aliaslib)
+                { c (input (TimeSeries t)) (:= a (* t 2)) (:= b (ident a)) (:= d (+ t 1)) (output b d) }""")
+            sys.path.insert(0, tmp)
+            try:
+                b, d = pype.Pipeline(os.path.join(tmp, 'alias.ppl'))['c'](timeseries.TimeSeries([1,2,3],[1.,2.,3.]))
+            finally:
+                sys.path.remove(tmp)
+                sys.modules.pop('aliaslib', None)
+        self.assertIsNot(b, d)
+        self.assertEqual(b.data.tolist(), [2., 4., 6.])
+        self.assertEqual(d.data.tolist(), [2., 3., 4.])
+
+    def test_frame_slots(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write('{ k (input x y) (:= a (* x y)) (:= b (+ a 1)) (:= c (- b y)) (output c a) }')
+            f.flush()
+            k = pype.Pipeline(f.name)['k']
+        # Inputs come first, then constants and computed values
+        self.assertListEqual(list(k.slots)[:2], ['x', 'y'])
+        self.assertEqual(sorted(k.slots.values()), list(range(len(k.slots))))
+        self.assertEqual(k(2, 3), (4, 6))
+        self.assertEqual(k(1, 1), (1, 1))
+
+    def test_memoize(self):
+        ts = timeseries.TimeSeries([1,2,3,4],[1.,2.,3.,6.])
+        fingerprint = ts.fingerprint()
+        self.assertEqual(timeseries.TimeSeries([1,2,3,4],[1.,2.,3.,6.]).fingerprint(), fingerprint)
+        with tempfile.TemporaryDirectory() as d:
+            pipeline = pype.Pipeline("samples/example1.ppl")
+            memo = pipeline.memoize('standardize', max_entries=1, directory=d)
+            first = memo(ts)
+            self.assertIs(memo(ts), first)
+            self.assertEqual((memo.hits, memo.misses), (1, 1))
+            # Modifying the series invalidates its fingerprint; modifying its
+            # arrays in place, which would not, fails
+            with self.assertRaises(ValueError):
+                ts.data[3] = 10.
+            with self.assertRaises(ValueError):
+                ts.time[3] = 5
+            ts[4] = 10.
+            self.assertNotEqual(ts.fingerprint(), fingerprint)
+            self.assertTrue(np.allclose(memo(ts).data, pipeline['standardize'](ts).data))
+            self.assertEqual(memo.misses, 2)
+            # The first result was evicted from memory, but is still on disk
+            ts[4] = 6.
+            self.assertTrue(np.allclose(memo(ts).data, first.data))
+            self.assertEqual(memo.disk_hits, 1)
+            # So is it for another memo of the same code
+            other = pype.Pipeline("samples/example1.ppl").memoize('standardize', directory=d)
+            other(ts)
+            self.assertEqual((other.disk_hits, other.misses), (1, 0))
+            self.assertAlmostEqual(memo.hit_rate(), 0.5)
+        # Editing a function, under the same name, makes other code
+        versions = []
+        for body in ('x*2', 'x*3'):
+            namespace = {}
+            exec('def double(x):\n    return %s' % body, namespace)
+            code = pype.pcode.PCode('c', ['x'], ['y'], {}, [pype.pcode.Instruction('y', namespace['double'], ('x',))])
+            versions.append(pype.memo.code_fingerprint(code))
+        self.assertNotEqual(versions[0], versions[1])
+
+    def test_profile(self):
+        pipeline = pype.Pipeline("samples/example1.ppl", profile=True)
+        ts = timeseries.TimeSeries([1,2,3,4],[1.,2.,3.,6.])
+        for _ in range(3):
+            pipeline['standardize'](ts)
+        pipeline.profiler.stop()
+        stats = pipeline.profiler.stats()[0]
+        self.assertEqual(stats.calls, 3)
+        nodes = {n.label: n for n in stats.nodes}
+        self.assertEqual(sorted(nodes), ['(- t mu)', '(/ (- t mu) sig)', '(mean t)', '(std t)'])
+        self.assertEqual(nodes['(mean t)'].position[0], 5)
+        self.assertEqual(set(n.calls for n in stats.nodes), {3})
+        # Dividing waits on everything else
+        self.assertAlmostEqual(nodes['(/ (- t mu) sig)'].cumulative_time, sum(n.self_time for n in stats.nodes))
+        self.assertIn('(std t)', pipeline.profile_report())
+        with self.assertRaises(ValueError):
+            pype.Pipeline("samples/example1.ppl").profile_report()
+        # Columns count from 1 on the first line as on the others
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write('{ neg (input x) (:= y (- x)) (output y) }')
+            f.flush()
+            pipeline = pype.Pipeline(f.name, profile=True)
+        self.assertEqual(pipeline['neg'](1), -1)
+        pipeline.profiler.stop()
+        node = pipeline.profiler.stats()[0].nodes[0]
+        self.assertEqual((node.position, node.label), ((1, 23), '(- x)'))
+        # A tracemalloc started by the caller keeps running, with its own peak
+        import tracemalloc
+        tracemalloc.start()
+        try:
+            big = bytearray(1 << 20)
+            del big
+            pipeline = pype.Pipeline("samples/example1.ppl", profile=True)
+            pipeline['standardize'](ts)
+            pipeline.profiler.stop()
+            self.assertTrue(tracemalloc.is_tracing())
+            self.assertGreaterEqual(tracemalloc.get_traced_memory()[1], 1 << 20)
+        finally:
+            tracemalloc.stop()
+
+    def test_inline_components(self):
+        source = """(import timeseries)
+{ both (input (TimeSeries t)) (:= b (+ (zscore t) (center t))) (output b) }
+{ center (input (TimeSeries t)) (:= c (- t (mean t))) (output c) }
+{ zscore (input (TimeSeries t)) (:= z (/ (center t) (std t))) (output z) }
+"""
+        ts = timeseries.TimeSeries([1,2,3,4],[1.,2.,3.,6.])
+        data = np.array([1.,2.,3.,6.])
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write(source)
+            f.flush()
+            pipeline = pype.Pipeline(f.name)
+            # The mean and the centered series are computed once for both calls
+            funcs = [ins.func.__name__ for ins in pipeline['both'].instructions]
+            self.assertEqual(sorted(funcs), ['_add_series', '_div_series_scalar', '_sub_series_scalar', 'mean', 'std'])
+            self.assertIn(('both', 'computed mean once for 2 uses'), pipeline.optimizations)
+            centered = data-data.mean()
+            self.assertTrue(np.allclose(pipeline['both'](ts).data, centered/data.std()+centered))
+            with pipeline.parallel('both', workers=2) as run:
+                self.assertTrue(np.allclose(run(ts).data, pipeline['both'](ts).data))
+            # Editing a caller alone recompiles it with what it calls
+            f.seek(0)
+            f.truncate()
+            f.write(source.replace('(+ (zscore t) (center t))', '(- (zscore t) (center t))'))
+            f.flush()
+            self.assertEqual(pipeline.reload(), ['both'])
+            self.assertTrue(np.allclose(pipeline['both'](ts).data, centered/data.std()-centered))
+        errors = {
+            '{ a (input x) (:= y (a x)) (output y) }': "Recursive call of component 'a'",
+            '{ a (input x) (output x) } { b (input x) (:= y (a x x)) (output y) }': "takes 1 input",
+            '{ a (input x y) (output x y) } { b (input x) (:= y (a x x)) (output y) }': "has 2 outputs",
+        }
+        for (program, message) in errors.items():
+            with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+                f.write(program)
+                f.flush()
+                with self.assertRaisesRegex(SyntaxError, message):
+                    pype.Pipeline(f.name)
+
+    def test_server(self):
+        import asyncio, json
+        server = pype.PipelineServer(['samples/example1.ppl'], max_batch=4, max_delay=0.05)
+        series = {'time': [1,2,3,4], 'data': [1.,2.,3.,6.]}
+        expected = pype.Pipeline("samples/example1.ppl")['standardize'](timeseries.TimeSeries(series['time'], series['data']))
+        async def session():
+            listening = await server.start(port=0)
+            port = listening.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            for i in range(8):
+                writer.write(json.dumps({'id': i, 'component': 'standardize', 'inputs': [series]}).encode()+b'\n')
+            writer.write(json.dumps({'id': 'bad', 'component': 'median', 'inputs': []}).encode()+b'\n')
+            writer.write(b'[1]\n3\nnot json\n')
+            await writer.drain()
+            responses = [json.loads(await reader.readline()) for _ in range(12)]
+            writer.close()
+            listening.close()
+            await listening.wait_closed()
+            return responses
+        responses = asyncio.run(session())
+        # Lines which are not JSON objects are answered with an error too
+        errors = sorted(r['error'].split(':')[0] for r in responses if r['id'] is None)
+        self.assertEqual(errors, ['JSONDecodeError', 'TypeError', 'TypeError'])
+        responses = {r['id']: r for r in responses}
+        for i in range(8):
+            self.assertTrue(np.allclose(responses[i]['result']['data'], expected.data))
+        self.assertIn("No component 'median'", responses['bad']['error'])
+        # Eight pipelined requests run as two full batches
+        stats = server.stats()['example1']['standardize']
+        self.assertEqual((stats['requests'], stats['batches'], stats['queue_depth']), (8, 2, 0))
+        self.assertLessEqual(stats['latency_ms']['p50'], stats['latency_ms']['p99'])
+        with self.assertRaises(ValueError):
+            asyncio.run(server.start(host='0.0.0.0'))
+        # The CLI prints the port it listens on, which the system picked
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = subprocess.Popen([sys.executable, '-m', 'pype', 'serve', 'samples/example1.ppl'],
+                                   cwd=root, stdout=subprocess.PIPE)
+        try:
+            port = int(process.stdout.readline().decode().rsplit(':', 1)[1])
+            import socket
+            with socket.create_connection(('127.0.0.1', port)) as client:
+                client.sendall(json.dumps({'id': 1, 'component': 'standardize', 'inputs': [series]}).encode()+b'\n')
+                response = json.loads(client.makefile().readline())
+            self.assertTrue(np.allclose(response['result']['data'], expected.data))
+        finally:
+            process.terminate()
+            process.wait()
+            process.stdout.close()
+
+    def test_server_threadsafe(self):
+        # Batches of components calling threadsafe=False functions never overlap
+        import asyncio
+        with tempfile.TemporaryDirectory() as tmp:
+            os.mkdir(os.path.join(tmp, 'unsafelib'))
+            with open(os.path.join(tmp, 'unsafelib', '__init__.py'), 'w') as f:
+                f.write("""import threading, time, pype
+lock = threading.Lock()
+running = [0, 0] # Now, at most
+@pype.component(threadsafe=False)
+def slow(x):
+    with lock:
+        running[0] += 1
+        running[1] = max(running)
+    time.sleep(0.01)
+    with lock:
+        running[0] -= 1
+    return x
+""")
+            with open(os.path.join(tmp, 'unsafe.ppl'), 'w') as f:
+                f.write("""(import unsafelib)
+                { first (input x) (:= y (slow x)) (output y) }
+                { second (input x) (:= y (slow x)) (output y) }""")
+            sys.path.insert(0, tmp)
+            try:
+                server = pype.PipelineServer([os.path.join(tmp, 'unsafe.ppl')], max_batch=1)
+                async def requests():
+                    return await asyncio.gather(*[server.handle({'id': i, 'component': ('first', 'second')[i%2], 'inputs': [i]}) for i in range(8)])
+                responses = asyncio.run(requests())
+                running = sys.modules['unsafelib'].running
+            finally:
+                sys.path.remove(tmp)
+                sys.modules.pop('unsafelib', None)
+        self.assertEqual([r['result'] for r in responses], list(range(8)))
+        self.assertEqual(running, [0, 1])
+
+    def test_dead_bindings(self):
+        # Removing dead nodes rewrites the variables once per pass, not per node
+        n = 5000
+        body = ' '.join('(:= v%d (+ x %d))' % (i, i) for i in range(n))
+        with tempfile.NamedTemporaryFile('w', suffix='.ppl') as f:
+            f.write('{ c (input x) %s (:= y (* x 2)) (output y) }' % body)
+            f.flush()
+            calls = []
+            remove_nodes = pype.fgir.Flowgraph.remove_nodes
+            def counting(graph, nodeids):
+                calls.append(len(list(nodeids)))
+                return remove_nodes(graph, nodeids)
+            pype.fgir.Flowgraph.remove_nodes = counting
+            try:
+                pipeline = pype.Pipeline(f.name)
+            finally:
+                pype.fgir.Flowgraph.remove_nodes = remove_nodes
+        self.assertEqual(pipeline['c'](3), 6)
+        self.assertEqual(list(pipeline.ir['c'].variables), ['x', 'y'])
+        self.assertEqual(len(pipeline.optimizations), n)
+        self.assertLessEqual(len(calls), 3)
+
 suite = unittest.TestLoader().loadTestsFromModule(MyTest())
 unittest.TextTestRunner().run(suite)
@@ -61,6 +61,114 @@ class MyTest(unittest.TestCase):
             TimeSeries([],[]).__neg__() 
 
 
+    def test_asof(self):
+        rng = np.random.RandomState(0)
+        right = TimeSeries(np.sort(rng.choice(1000, 200, replace=False)), rng.rand(200))
+        left = TimeSeries(rng.randint(-10, 1010, 500), np.zeros(500))
+        def expected(t, direction, tolerance):
+            before = [i for i in range(len(right)) if right.time[i] <= t]
+            after = [i for i in range(len(right)) if right.time[i] >= t]
+            candidates = {'backward': before[-1:], 'forward': after[:1]}.get(direction, before[-1:]+after[:1])
+            candidates = [i for i in candidates if tolerance is None or abs(right.time[i]-t) <= tolerance]
+            if not candidates:
+                return np.nan
+            return right.data[min(candidates, key=lambda i: (abs(right.time[i]-t), right.time[i]))]
+        for direction in ('backward', 'forward', 'nearest'):
+            for tolerance in (None, 2):
+                joined = left.asof(right, tolerance=tolerance, direction=direction)
+                self.assertTrue(np.array_equal(joined.time, left.time))
+                self.assertTrue(np.allclose(joined.data, [expected(t, direction, tolerance) for t in left.time], equal_nan=True))
+        # Series sharing their times share the search
+        other = TimeSeries(right.time, -right.data)
+        joined = left.asof_many([right, other, TimeSeries([], [])])
+        self.assertTrue(np.allclose(joined[1].data, -joined[0].data, equal_nan=True))
+        self.assertTrue(np.isnan(joined[2].data).all())
+        with self.assertRaises(ValueError):
+            left.asof(right, direction='sideways')
+
+    def test_quantile_sketch(self):
+        import pickle
+        from timeseries.timeseries import QuantileSketch
+        data = np.random.RandomState(0).standard_normal(200000)
+        # Sketches of chunks, pickled as if sent by other processes, merge into one of the whole
+        merged = QuantileSketch(seed=0)
+        for (i,chunk) in enumerate(np.array_split(data, 20)):
+            sketch = TimeSeries(np.arange(len(chunk)), chunk).sketch(seed=i)
+            merged.merge(pickle.loads(pickle.dumps(sketch)))
+        self.assertEqual(len(merged), len(data))
+        self.assertLess(sum(len(level) for level in merged._levels), 2000)
+        ranks = np.searchsorted(np.sort(data), merged.percentile([1, 10, 50, 90, 99]))/len(data)
+        self.assertTrue(np.all(np.abs(ranks-[.01, .1, .5, .9, .99]) < 0.01))
+        self.assertEqual(merged.quantile(0), data.min())
+        self.assertEqual(merged.quantile(1), data.max())
+        ts = TimeSeries(range(5), [5, 1, 4, 2, 3])
+        self.assertEqual(ts.percentile(50), 3)
+        self.assertEqual(ts.sketch().median(), 3)
+        with self.assertRaises(ValueError):
+            QuantileSketch().median()
+
+    def test_decimation(self):
+        rng = np.random.RandomState(0)
+        ts = TimeSeries(np.arange(100000), rng.standard_normal(100000).cumsum())
+        for method in (ts.lttb, ts.minmax):
+            small = method(1000)
+            self.assertLessEqual(len(small), 1000)
+            self.assertTrue(np.all(np.diff(small.time) > 0))
+            self.assertTrue(np.isin(small.time, ts.time).all())
+        # Min-max keeps the extremes; so do the first and last points of LTTB
+        self.assertEqual(ts.minmax(1000).data.max(), ts.data.max())
+        self.assertEqual((ts.lttb(1000).time[0], ts.lttb(1000).time[-1]), (0, 99999))
+        self.assertEqual(len(ts.lttb(10**6)), len(ts))
+        # Views of the pyramid keep the extremes of the range they show
+        pyramid = ts.pyramid()
+        self.assertIs(ts.pyramid(), pyramid)
+        view = pyramid.view(500, 20000, 60000)
+        self.assertLessEqual(len(view), 500)
+        self.assertTrue((view.time >= 20000).all() and (view.time <= 60000).all())
+        self.assertEqual(view.data.min(), ts.data[20000:60001].min())
+        ts[5] = 1000.
+        self.assertIsNot(ts.pyramid(), pyramid)
+        self.assertEqual(ts.pyramid().view(100).data.max(), 1000.)
+        self.assertTrue(str(ts).endswith(', ...], length=100000'))
+        # Missing values never hide the extremes of the rest of their interval
+        gappy = TimeSeries(np.arange(16), [np.nan, 5., -3., 1.]*3+[np.nan]*4)
+        self.assertEqual(gappy.minmax(8).data[:6].tolist(), [5., -3.]*3)
+        gappy = TimeSeries(np.arange(4096), np.where(np.arange(4096)%4 == 0, np.nan, np.sin(np.arange(4096.))))
+        view = gappy.pyramid().view(64)
+        self.assertEqual(np.nanmax(view.data), np.nanmax(gappy.data))
+        self.assertEqual(np.nanmin(view.data), np.nanmin(gappy.data))
+        # nor change the points LTTB keeps elsewhere
+        gappy = TimeSeries(ts.time[:10000], np.where(ts.time[:10000] == 5000, np.nan, ts.data[:10000]))
+        self.assertEqual(gappy.lttb(200).time.tolist(), TimeSeries(ts.time[:10000], ts.data[:10000]).lttb(200).time.tolist())
+        self.assertFalse(np.isnan(gappy.lttb(200).data).any())
+
+    def test_buffered_ingest(self):
+        from timeseries.timeseries import BufferedTimeSeries
+        rng = np.random.RandomState(0)
+        ts = BufferedTimeSeries([5, 1, 3, 1], [50., 10., 30., 11.], buffer_size=16)
+        self.assertEqual(ts.time.tolist(), [1, 3, 5])
+        self.assertEqual(ts[1], 11.)
+        expected = dict(zip(ts.time.tolist(), ts.data.tolist()))
+        for (i,t) in enumerate(rng.randint(0, 500, 2000)):
+            ts[int(t)] = float(i)
+            expected[int(t)] = float(i)
+            if i % 97 == 0:
+                # Reads see the points still in the buffer
+                self.assertEqual(ts[int(t)], float(i))
+                self.assertIn(int(t), ts)
+                self.assertEqual(len(ts), len(expected))
+        self.assertEqual(ts.time.tolist(), sorted(expected))
+        self.assertEqual(ts.data.tolist(), [expected[t] for t in sorted(expected)])
+        self.assertEqual(ts.pending, 0)
+        self.assertAlmostEqual(ts.mean(), np.mean(list(expected.values())))
+        # Bulk inserts, and consistent fingerprints across merges
+        before = ts.fingerprint()
+        ts.insert([1000.5, -1], [1., 2.])
+        self.assertNotEqual(ts.fingerprint(), before)
+        self.assertEqual((ts.time[0], ts.time[-1]), (-1, 1000.5))
+        self.assertEqual(ts.interpolate([1000.5]).data.tolist(), [1.])
+        self.assertNotIn(2000, ts)
+
     # def test_abs(self):
     #     self.assertEqual( TimeSeries([1,2,3],[-1,2,-4]).__abs__, [1,2,4]  )
     #     self.assertEqual( TimeSeries([1,2,3],[1,2,4]).__abs__, [1,2,4]  )
@@ -1,7 +1,27 @@
-import pkg_resources
 from .timeseries import *
 
-try:
-    __version__ = pkg_resources.get_distribution(__name__).version
-except:
-    __version__ = 'unknown'
+def _version():
+    # importlib.metadata is new in Python 3.8: before, its backport or
+    # pkg_resources looks the version up
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        try:
+            from importlib_metadata import version, PackageNotFoundError
+        except ImportError:
+            import pkg_resources
+            try:
+                return pkg_resources.get_distribution(__name__).version
+            except pkg_resources.DistributionNotFound:
+                return 'unknown'
+    try:
+        return version(__name__)
+    except PackageNotFoundError:
+        return 'unknown'
+
+def __getattr__(name):
+    # Looking the version up is slow, so it is only done when asked for
+    if name == '__version__':
+        value = globals()[name] = _version()
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
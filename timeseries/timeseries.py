@@ -1,5 +1,7 @@
+import hashlib
+import numbers
+import operator
 import numpy as np
-from pytest import raises
 import pype
 
 def f(a):
@@ -60,6 +62,323 @@ class LazyOperation():
         return self.function(*self.args,**self.kwargs)
 
 
+def _check_batch(data):
+    if data.shape[1] == 0: raise ValueError("Cannot perform operation on empty list")
+    return data
+
+def _batch_mean(data):
+    return np.mean(_check_batch(data), axis=1)
+
+def _batch_std(data):
+    return np.std(_check_batch(data), axis=1)
+
+class RunningMoments():
+    """
+    An accumulator of the count, mean and sum of squared deviations of a
+    series which arrives in chunks, combining the moments of each chunk with
+    Chan et al.'s parallel update; accumulators can be merged with each other
+
+    Examples
+    --------
+    >>> m = RunningMoments()
+    >>> m.update(TimeSeries([0,1],[1,2]))
+    >>> other = RunningMoments()
+    >>> other.update(TimeSeries([2,3],[3,6]))
+    >>> m.merge(other)
+    >>> m.n, float(m.mean), float(m.m2)
+    (4, 3.0, 14.0)
+    """
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+    def update(self, ts):
+        data = np.asarray(ts.data, dtype=float)
+        if len(data) == 0:
+            return
+        mean = np.mean(data)
+        self._combine(len(data), mean, np.sum((data-mean)**2))
+    def merge(self, other):
+        self._combine(other.n, other.mean, other.m2)
+    def _combine(self, n, mean, m2):
+        if n == 0:
+            return
+        total = self.n+n
+        delta = mean-self.mean
+        self.mean += delta*n/total
+        self.m2 += m2+delta**2*self.n*n/total
+        self.n = total
+    def _check(self):
+        if self.n == 0: raise ValueError("Cannot perform operation on empty list")
+
+class _RunningMean(RunningMoments):
+    def result(self):
+        self._check()
+        return self.mean
+
+class _RunningStd(RunningMoments):
+    def result(self):
+        self._check()
+        return np.sqrt(self.m2/self.n)
+
+class QuantileSketch():
+    """
+    A KLL sketch of the distribution of the values of a series, or of many
+    series or chunks, in memory which grows only logarithmically with the
+    number of values; sketches merge, also across processes, since they
+    pickle. Quantiles are answered with a rank error which shrinks as 1/k:
+    with the default k=200, the value returned for q is that of a quantile
+    within about 0.01 of q.
+
+    Parameters
+    ----------
+    k : the size of the largest compactor, trading memory for accuracy
+    seed : the seed of the coin flips deciding which values are kept
+
+    Returns
+    -------
+    update(values): None
+        adds the values of a series or an array, nans aside
+    merge(other): None
+        adds everything other has seen
+    quantile(q): value
+        returns a value whose rank is about q*n, for a number or an array of
+        them between 0 and 1; the minimum and maximum are exact
+    percentile(p): value
+        returns quantile(p/100)
+    median(): value
+        returns quantile(0.5)
+
+    Examples
+    --------
+    >>> sketch = QuantileSketch(seed=0)
+    >>> sketch.update(TimeSeries(range(100000), np.arange(100000)))
+    >>> other = QuantileSketch(seed=1)
+    >>> other.update(np.arange(100000, 200000))
+    >>> sketch.merge(other)
+    >>> sketch.n, float(sketch.min), float(sketch.max)
+    (200000, 0.0, 199999.0)
+    >>> bool(abs(sketch.median()-100000) < 2000)
+    True
+    """
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.n = 0
+        self.min = np.nan
+        self.max = np.nan
+        self._levels = [np.zeros(0)] # Items at level h stand for 2**h values each
+        self._random = np.random.RandomState(seed)
+    def __len__(self):
+        return self.n
+    def update(self, values):
+        values = np.asarray(getattr(values, 'data', values), dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self._add(len(values), values.min(), values.max())
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compress()
+    def merge(self, other):
+        if other.n == 0:
+            return
+        self._add(other.n, other.min, other.max)
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.zeros(0))
+        for (h,items) in enumerate(other._levels):
+            self._levels[h] = np.concatenate([self._levels[h], items])
+        self._compress()
+    def _add(self, n, low, high):
+        self.n += n
+        self.min = low if np.isnan(self.min) else min(self.min, low)
+        self.max = high if np.isnan(self.max) else max(self.max, high)
+    def _capacity(self, h):
+        # Lower levels, whose items weigh less, get less room
+        return max(int(np.ceil(self.k*(2./3)**(len(self._levels)-h-1))), 2)
+    def _compress(self):
+        compacted = True
+        while compacted:
+            compacted = False
+            for h in range(len(self._levels)):
+                items = self._levels[h]
+                if len(items) <= self._capacity(h):
+                    continue
+                if h+1 == len(self._levels):
+                    self._levels.append(np.zeros(0))
+                # Every other sorted item goes up a level, weighing twice as
+                # much; an odd one out stays
+                items = np.sort(items)
+                rest = len(items) % 2
+                promoted = items[rest+self._random.randint(2)::2]
+                self._levels[h] = items[:rest]
+                self._levels[h+1] = np.concatenate([self._levels[h+1], promoted])
+                compacted = True
+    def quantile(self, q):
+        if self.n == 0: raise ValueError("Cannot perform operation on empty list")
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(l), 2.**h) for (h,l) in enumerate(self._levels)])
+        order = np.argsort(items, kind='stable')
+        items, ranks = items[order], np.cumsum(weights[order])
+        q = np.asarray(q, dtype=float)
+        index = np.minimum(np.searchsorted(ranks, q*ranks[-1], side='left'), len(items)-1)
+        result = np.where(q <= 0, self.min, np.where(q >= 1, self.max, items[index]))
+        return result[()] if result.ndim == 0 else result
+    def percentile(self, p):
+        return self.quantile(np.asarray(p, dtype=float)/100.)
+    def median(self):
+        return self.quantile(0.5)
+
+# Decimation for display: a series of a few thousand points drawn in place of
+# one of millions, keeping its visual shape
+def _nan_filled(data, fill):
+    """Returns data with its NaNs replaced by fill, so that the minimum or the
+    maximum of an interval is that of its other values."""
+    data = np.asarray(data)
+    if data.dtype.kind != 'f':
+        return data
+    return np.where(np.isnan(data), fill, data)
+
+def _minmax_indices(time, data, pixels):
+    """Returns the sorted positions of the minimum and maximum of the values
+    falling in each of pixels equal intervals of time."""
+    if len(time) <= 2*pixels:
+        return np.arange(len(time))
+    edges = np.linspace(time[0], time[-1], pixels+1)[1:-1]
+    starts = np.concatenate([[0], np.searchsorted(time, edges, side='left')])
+    starts = starts[np.concatenate([[True], starts[1:] != starts[:-1]]) & (starts < len(time))]
+    lengths = np.diff(np.append(starts, len(time)))
+    picked = []
+    for (reduce, fill) in ((np.minimum, np.inf), (np.maximum, -np.inf)):
+        values = _nan_filled(data, fill)
+        extremes = np.repeat(reduce.reduceat(values, starts), lengths)
+        # The first position of each interval where its extreme is reached
+        hits = np.flatnonzero(values == extremes)
+        picked.append(hits[np.searchsorted(hits, starts)])
+    return np.unique(np.concatenate(picked))
+
+def _lttb_indices(time, data, n):
+    """Returns the positions of the points Largest-Triangle-Three-Buckets keeps:
+    the first and the last, and in each of n-2 buckets the point forming the
+    largest triangle with the point kept before it and the average of the
+    next bucket."""
+    size = len(time)
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        return np.array([0, size-1][:n], dtype=np.intp)
+    x = np.asarray(time, dtype=float)
+    y = np.asarray(data, dtype=float)
+    # NaNs are left out of the averages, and neither picked nor taken as the
+    # point kept before while their bucket has other values
+    valid = ~np.isnan(y)
+    edges = np.append(np.linspace(1, size-1, n-1).astype(np.intp), size)
+    kept = np.empty(n, dtype=np.intp)
+    kept[0], kept[-1] = 0, size-1
+    a = 0 if valid[0] or not valid.any() else int(np.argmax(valid))
+    for i in range(n-2):
+        lo, hi, end = edges[i], edges[i+1], edges[i+2]
+        counted = valid[hi:end]
+        if counted.all():
+            cx, cy = x[hi:end].mean(), y[hi:end].mean()
+        elif counted.any():
+            cx, cy = x[hi:end][counted].mean(), y[hi:end][counted].mean()
+        else:
+            cx, cy = x[hi:end].mean(), y[a]
+        areas = np.abs((x[a]-cx)*(y[lo:hi]-y[a])-(x[a]-x[lo:hi])*(cy-y[a]))
+        areas[~valid[lo:hi]] = -np.inf
+        kept[i+1] = lo+int(np.argmax(areas))
+        if valid[kept[i+1]]:
+            a = kept[i+1]
+    return kept
+
+class DecimationPyramid():
+    """
+    Min-max decimations of a series at halving resolutions, computed once so
+    that views of any time range are drawn from the coarsest level which
+    still has enough points in it, in time proportional to the points drawn
+    rather than to the length of the series
+
+    Parameters
+    ----------
+    series : a TimeSeries
+    smallest : the number of points below which no coarser level is built
+
+    Returns
+    -------
+    view(n, start, stop): TimeSeries
+        returns at most n points of the series between times start and stop,
+        keeping the minimum and maximum of every n/2 intervals of time
+
+    Examples
+    --------
+    >>> pyramid = DecimationPyramid(TimeSeries(np.arange(100000), np.sin(np.arange(100000)/1000.)))
+    >>> [len(level[0]) for level in pyramid.levels]
+    [100000, 50000, 25000, 12500, 6250, 3126, 1564, 782]
+    >>> view = pyramid.view(100, start=20000, stop=30000)
+    >>> len(view) <= 100, float(view.data.max()) == float(np.sin(np.arange(20000, 30001)/1000.).max())
+    (True, True)
+    """
+    def __init__(self, series, smallest=1024):
+        time, data = np.asarray(series.time), np.asarray(series.data)
+        self.levels = [(time, data)]
+        while len(time) > smallest:
+            # The minimum and maximum of each 4 points, in time order
+            whole = len(time)//4*4
+            blocks = data[:whole].reshape(-1, 4)
+            rows = np.arange(len(blocks))*4
+            low, high = rows+_nan_filled(blocks, np.inf).argmin(axis=1), rows+_nan_filled(blocks, -np.inf).argmax(axis=1)
+            index = np.concatenate([np.sort(np.stack([low, high], axis=1), axis=1).ravel(), np.arange(whole, len(time))])
+            time, data = time[index], data[index]
+            self.levels.append((time, data))
+    def view(self, n, start=None, stop=None):
+        for (time, data) in reversed(self.levels):
+            lo = 0 if start is None else np.searchsorted(time, start, side='left')
+            hi = len(time) if stop is None else np.searchsorted(time, stop, side='right')
+            # Enough points to choose from, or the full resolution
+            if hi-lo >= 4*n or time is self.levels[0][0]:
+                break
+        time, data = time[lo:hi], data[lo:hi]
+        index = _minmax_indices(time, data, max(n//2, 1)) if len(time) else np.arange(0)
+        return TimeSeries(time[index], data[index])
+
+# As-of joins: for each time of a series, the position of the matching time of
+# another, sorted, time axis, found by binary search rather than a Python loop
+ASOF_DIRECTIONS = ('backward', 'forward', 'nearest')
+
+def _asof_index(time, other, tolerance, direction):
+    """Returns, for each of time, the position in the sorted array other of the
+    latest time at or before it (backward), the earliest at or after it
+    (forward) or the closest of both (nearest, backward on ties); -1 where
+    there is none, or none within tolerance."""
+    if direction not in ASOF_DIRECTIONS:
+        raise ValueError("direction must be one of {}, not {!r}".format(', '.join(ASOF_DIRECTIONS), direction))
+    time = np.asarray(time)
+    other = np.asarray(other)
+    if len(other) == 0:
+        return np.full(len(time), -1, dtype=np.intp)
+    if direction == 'backward':
+        index = np.searchsorted(other, time, side='right')-1
+    elif direction == 'forward':
+        index = np.searchsorted(other, time, side='left')
+        index[index == len(other)] = -1
+    else:
+        before = _asof_index(time, other, None, 'backward')
+        after = _asof_index(time, other, None, 'forward')
+        gap_before = np.where(before >= 0, time-other[before], np.inf)
+        gap_after = np.where(after >= 0, other[after]-time, np.inf)
+        index = np.where(gap_after < gap_before, after, before)
+    if tolerance is not None:
+        index[(index >= 0) & (np.abs(time-other[index]) > tolerance)] = -1
+    return index
+
+def _take(data, index):
+    'Returns data at index, with nan where index is -1.'
+    missing = index < 0
+    if not missing.any():
+        return data[index]
+    values = data[np.where(missing, 0, index)].astype(float) if len(data) else np.zeros(len(index))
+    values[missing] = np.nan
+    return values
+
 class TimeSeries(): 
     """
     An class that takes a sequence of integers or floats as input
@@ -77,6 +396,12 @@ class TimeSeries():
         returns the value of the TimeSeries at position
     Timeseries[position:int] = value:int/float
         set value of TimeSeries at position to be value
+    fingerprint(): string
+        returns a hash of the times and values, cached until the series is
+        modified through Timeseries[position] = value or its arrays are
+        replaced; the arrays hashed become read-only, so that modifying
+        ts.data[...] or ts.time[...] in place raises ValueError rather than
+        leaving the fingerprint stale
     __str__ / __repr__:
         when printing TimeSeries, if the total length of the Timeseries is greater than 10
         the result shows the first ten elements and its total length, else it prints the 
@@ -134,6 +459,8 @@ class TimeSeries():
         self.data=np.array(data)
         self.index=0
         self.len=len(time)
+        self._fingerprint=None
+        self._pyramid=None
         
     def __len__(self):
         return len(self.data)
@@ -144,7 +471,11 @@ class TimeSeries():
     def __setitem__(self,time,value):
         if time not in self.time:
              raise "Time does not exist"
+        if not self.data.flags.writeable:
+            self.data = self.data.copy() # Read-only since fingerprinted
         self.data[np.where(self.time==time)]=value
+        self._fingerprint=None
+        self._pyramid=None
     def __contains__(self, time):
         return time in self.time
     def __next__(self): 
@@ -163,13 +494,35 @@ class TimeSeries():
     def iteritems(self):
         return iter(list(zip(self.time,self.data)))
     def __str__(self):
+        # Only the points shown are zipped, however long the series
         if self.len>10:
-            return '[{}, ...], length={}'.format(str(list(zip(self.time,self.data))[0:10])[1:-1], self.len)
+            return '[{}, ...], length={}'.format(str(list(zip(self.time[:10],self.data[:10])))[1:-1], self.len)
         return '{}'.format(list(zip(self.time,self.data)))
     def __repr__(self):
-        if self.len>10:
-            return '[{}, ...], length={}'.format(str(list(zip(self.time,self.data))[0:10])[1:-1], self.len)
-        return '{}'.format(list(zip(self.time,self.data)))
+        return self.__str__()
+    def fingerprint(self):
+        cached = getattr(self, '_fingerprint', None)
+        # Replacing time or data makes the cached value stale too
+        if cached is not None and cached[0] is self.time and cached[1] is self.data:
+            return cached[2]
+        # Hashed arrays are frozen, so that nothing changes them in place; a
+        # view is copied first, as writing into its base would still change it
+        for name in ('time', 'data'):
+            a = getattr(self, name)
+            if a.flags.writeable:
+                if a.base is not None:
+                    a = a.copy()
+                    setattr(self, name, a)
+                a.flags.writeable = False
+        h = hashlib.blake2b(digest_size=16)
+        for a in (self.time, self.data):
+            h.update(repr((a.dtype.str, a.shape)).encode())
+            if a.dtype.hasobject:
+                h.update(repr(a.tolist()).encode())
+            else:
+                h.update(np.ascontiguousarray(a).data)
+        self._fingerprint = (self.time, self.data, h.hexdigest())
+        return self._fingerprint[2]
     def values(self):
         return list(self.data)
     def times(self):
@@ -179,21 +532,93 @@ class TimeSeries():
     def interpolate(self,newtime):
         newvalue=np.interp(newtime,self.time,self.data)
         return TimeSeries(newtime,newvalue)
+    def asof(self, other, tolerance=None, direction='backward'):
+        """
+        Returns a series on the times of this one, with for each time the value
+        of other at its latest time at or before it (backward), its earliest
+        time at or after it (forward) or its closest time (nearest); times with
+        no such value within tolerance get nan
+
+        >>> quotes = TimeSeries([1, 4, 8], [10., 40., 80.])
+        >>> trades = TimeSeries([0, 4, 5, 9], [0, 0, 0, 0])
+        >>> trades.asof(quotes).data.tolist()
+        [nan, 40.0, 40.0, 80.0]
+        >>> trades.asof(quotes, tolerance=1, direction='nearest').data.tolist()
+        [10.0, 40.0, 40.0, 80.0]
+        """
+        return TimeSeries(self.time, _take(other.data, _asof_index(self.time, other.time, tolerance, direction)))
+    def asof_many(self, others, tolerance=None, direction='backward'):
+        """
+        Returns the as-of join of this series with each of others, as a list;
+        the matching positions are searched once for all the series sharing
+        a time axis, as columns of the same table usually do
+
+        >>> bid, ask = TimeSeries([1, 4], [9., 39.]), TimeSeries([1, 4], [11., 41.])
+        >>> [s.data.tolist() for s in TimeSeries([2, 5], [0, 0]).asof_many([bid, ask])]
+        [[9.0, 39.0], [11.0, 41.0]]
+        """
+        indexes = [] # [(time, index)]
+        result = []
+        for other in others:
+            index = next((i for (t,i) in indexes if t is other.time or (len(t) == len(other.time) and np.array_equal(t, other.time))), None)
+            if index is None:
+                index = _asof_index(self.time, other.time, tolerance, direction)
+                indexes.append((other.time, index))
+            result.append(TimeSeries(self.time, _take(other.data, index)))
+        return result
     @property
     def lazy(self):
         lazy_fun = LazyOperation(f,self)
         return lazy_fun
-    @pype.component
+    @pype.component(vectorized=_batch_mean, accumulator=_RunningMean, returns=numbers.Real)
     def mean(self):
         if self.len == 0: raise ValueError("Cannot perform operation on empty list")
         return np.mean(self.data)
-    @pype.component
+    @pype.component(vectorized=_batch_std, accumulator=_RunningStd, returns=numbers.Real)
     def std(self):
         if self.len == 0: raise ValueError("Cannot perform operation on empty list")
         return np.std(self.data)
     def median(self):
         if self.len == 0: raise ValueError("Cannot perform operation on empty list")
         return np.median(self.data)
+    def percentile(self, p):
+        if self.len == 0: raise ValueError("Cannot perform operation on empty list")
+        return np.percentile(self.data, p)
+    def lttb(self, n):
+        """
+        Returns n points of the series chosen by Largest-Triangle-Three-Buckets,
+        which keeps the points that shape its plot
+
+        >>> TimeSeries(range(7), [0, 1, 0, 5, 0, 1, 0]).lttb(3).time.tolist()
+        [0, 3, 6]
+        """
+        index = _lttb_indices(self.time, self.data, n)
+        return TimeSeries(self.time[index], self.data[index])
+    def minmax(self, n):
+        """
+        Returns at most n points of the series: the minimum and the maximum of
+        each of n/2 equal intervals of time, as drawn on n/2 pixels
+
+        >>> TimeSeries(range(8), [3, 1, 2, 9, 4, 4, 0, 5]).minmax(4).data.tolist()
+        [1, 9, 0, 5]
+        """
+        index = _minmax_indices(self.time, self.data, max(n//2, 1))
+        return TimeSeries(self.time[index], self.data[index])
+    def pyramid(self):
+        'Returns the DecimationPyramid of the series, built once until it is modified.'
+        cached = getattr(self, '_pyramid', None)
+        if cached is None or cached[0] is not self.time or cached[1] is not self.data:
+            self._pyramid = cached = (self.time, self.data, DecimationPyramid(self))
+        return cached[2]
+    def sketch(self, k=200, seed=None):
+        """
+        Returns a QuantileSketch of the values of the series, to merge with the
+        sketches of other series or chunks, and query for approximate
+        percentiles instead of sorting all the values again
+        """
+        sketch = QuantileSketch(k, seed)
+        sketch.update(self)
+        return sketch
     
     def _check_times_helper(self,rhs):
         if not self.times() == rhs.times():
@@ -248,6 +673,21 @@ class TimeSeries():
     def __rsub__(self, other): # other + self delegates to __sub__
         return -self + other
     
+    def __truediv__(self, rhs):
+        try:
+            if isinstance(rhs, numbers.Real):
+                return TimeSeries(self.time,self.data/rhs) 
+            else: #
+                self._check_times_helper(rhs)
+                return TimeSeries(self.time,self.data/rhs.data)
+        except TypeError:
+            raise NotImplemented
+    
+    def __rtruediv__(self, other): # other / self
+        if isinstance(other, numbers.Real):
+            return TimeSeries(self.time,other/self.data)
+        return NotImplemented
+    
     def __pos__(self):
         if self.len!=0:
             return self.data
@@ -259,6 +699,211 @@ class TimeSeries():
             return -self.data
         else:
             raise ValueError
+
+class BufferedTimeSeries(TimeSeries):
+    """
+    A TimeSeries for ingesting points late and out of order: ts[time] = value
+    adds the point, or replaces the value at that time, in a write buffer
+    instead of the sorted arrays. The buffer is merged into them in one linear
+    pass when it fills up, or when the arrays are read; point reads look in
+    the buffer first, without merging. Every read sees the merged series.
+
+    The buffer holds at least buffer_size points, and a 64th of the series,
+    so that merging costs a bounded number of copies per point however long
+    the series grows.
+
+    Parameters
+    ----------
+    time : any finite numeric sequence, sorted here if it is not
+    data : any finite numeric sequence
+    buffer_size : the number of points buffered before a merge
+
+    Returns
+    -------
+    Timeseries[time] = value:
+        inserts or replaces the point at time
+    insert(times, values): None
+        inserts or replaces many points at once
+    pending: int
+        the number of points waiting in the buffer
+
+    Examples
+    --------
+    >>> ts = BufferedTimeSeries([1, 3, 5], [10., 30., 50.])
+    >>> ts[4] = 40.
+    >>> ts[0] = 0.
+    >>> ts[3] = 33.
+    >>> ts[4], ts.pending
+    (40.0, 3)
+    >>> ts.time.tolist(), ts.data.tolist(), ts.pending
+    ([0, 1, 3, 4, 5], [0.0, 10.0, 33.0, 40.0, 50.0], 0)
+    >>> float(ts.interpolate([2]).data[0])
+    21.5
+    """
+    def __init__(self, time, data, buffer_size=4096):
+        if len(time)!=len(data):
+            raise ValueError("Not the same length")
+        time, data = np.array(time), np.array(data)
+        if np.any(np.diff(time) <= 0):
+            # Sorted, the last of equal times winning
+            order = np.argsort(time, kind='stable')
+            time, data = time[order], data[order]
+            last = np.append(time[1:] != time[:-1], True)
+            time, data = time[last], data[last]
+        self._time = time
+        self._data = data
+        self._buffer = {} # {time => value}, the latest write winning
+        self.buffer_size = buffer_size
+        self.index=0
+        self._fingerprint=None
+        self._pyramid=None
+
+    # Reading the arrays merges the buffer into them first
+    @property
+    def time(self):
+        self._merge()
+        return self._time
+    @time.setter
+    def time(self, time):
+        self._merge()
+        self._time = time
+    @property
+    def data(self):
+        self._merge()
+        return self._data
+    @data.setter
+    def data(self, data):
+        self._merge()
+        self._data = data
+    @property
+    def len(self):
+        self._merge()
+        return len(self._time)
+    @property
+    def pending(self):
+        return len(self._buffer)
+
+    def _lookup(self, time):
+        'Returns the position of time in the sorted arrays, or None.'
+        i = np.searchsorted(self._time, time)
+        return i if i < len(self._time) and self._time[i] == time else None
+    def __getitem__(self, time):
+        if time in self._buffer:
+            return self._buffer[time]
+        i = self._lookup(time)
+        if i is None:
+            raise KeyError(time)
+        return self._data[i]
+    def __contains__(self, time):
+        return time in self._buffer or self._lookup(time) is not None
+    def __setitem__(self, time, value):
+        self._buffer[time] = value
+        self._fingerprint=None
+        self._pyramid=None
+        if len(self._buffer) >= max(self.buffer_size, len(self._time)//64):
+            self._merge()
+    def insert(self, times, values):
+        if len(times)!=len(values):
+            raise ValueError("Not the same length")
+        self._buffer.update(zip(times, values))
+        self._fingerprint=None
+        self._pyramid=None
+        if len(self._buffer) >= max(self.buffer_size, len(self._time)//64):
+            self._merge()
+
+    def _merge(self):
+        if not self._buffer:
+            return
+        times = np.array(list(self._buffer.keys()))
+        values = np.array(list(self._buffer.values()))
+        self._buffer = {}
+        order = np.argsort(times)
+        times, values = times[order], values[order]
+        # Where each buffered point goes, in one pass over the sorted arrays;
+        # points at times already there replace their values
+        position = np.searchsorted(self._time, times)
+        inside = position < len(self._time)
+        replaced = np.zeros(len(times), dtype=bool)
+        replaced[inside] = self._time[position[inside]] == times[inside]
+        time = self._time.astype(np.result_type(self._time, times), copy=False)
+        data = self._data.astype(np.result_type(self._data, values))
+        data[position[replaced]] = values[replaced]
+        added = ~replaced
+        self._time = np.insert(time, position[added], times[added])
+        self._data = np.insert(data, position[added], values[added])
+
+# Kernels of the arithmetic operators for each kind of operands, which pype
+# binds in place of the operator methods above when it knows the types of the
+# operands at compile time, skipping their isinstance checks. They can write
+# into the data of a series pype no longer needs (out), instead of allocating.
+def _result_dtype(ufunc, lhs, rhs):
+    'The dtype ufunc returns for lhs and rhs, found by calling it on no values.'
+    return ufunc(*[x[:0] if np.ndim(x) else x for x in (lhs, rhs)]).dtype
+
+def _elementwise(ufunc, time, lhs, rhs, out):
+    if out is not None:
+        shape = np.broadcast_shapes(np.shape(lhs), np.shape(rhs))
+        # Division of integers returns floats: an integer buffer cannot hold them
+        if out.data.shape == shape and out.data.flags.writeable and _result_dtype(ufunc, lhs, rhs) == out.data.dtype:
+            ufunc(lhs, rhs, out=out.data)
+            out.time = time
+            out._fingerprint = None
+            out._pyramid = None
+            return out
+    return TimeSeries(time, ufunc(lhs, rhs))
+
+@pype.kernel(operator.add, TimeSeries, TimeSeries, out=True)
+def _add_series(lhs, rhs, out=None):
+    lhs._check_times_helper(rhs)
+    return _elementwise(np.add, lhs.time, lhs.data, rhs.data, out)
+
+@pype.kernel(operator.add, TimeSeries, numbers.Real, out=True)
+def _add_series_scalar(lhs, rhs, out=None):
+    return _elementwise(np.add, lhs.time, lhs.data, rhs, out)
+
+@pype.kernel(operator.add, numbers.Real, TimeSeries, out=True)
+def _add_scalar_series(lhs, rhs, out=None):
+    return _elementwise(np.add, rhs.time, lhs, rhs.data, out)
+
+@pype.kernel(operator.sub, TimeSeries, TimeSeries, out=True)
+def _sub_series(lhs, rhs, out=None):
+    lhs._check_times_helper(rhs)
+    return _elementwise(np.subtract, lhs.time, lhs.data, rhs.data, out)
+
+@pype.kernel(operator.sub, TimeSeries, numbers.Real, out=True)
+def _sub_series_scalar(lhs, rhs, out=None):
+    return _elementwise(np.subtract, lhs.time, lhs.data, rhs, out)
+
+@pype.kernel(operator.sub, numbers.Real, TimeSeries, out=True)
+def _sub_scalar_series(lhs, rhs, out=None):
+    return _elementwise(np.subtract, rhs.time, lhs, rhs.data, out)
+
+@pype.kernel(operator.mul, TimeSeries, TimeSeries, out=True)
+def _mul_series(lhs, rhs, out=None):
+    lhs._check_times_helper(rhs)
+    return _elementwise(np.multiply, lhs.time, lhs.data, rhs.data, out)
+
+@pype.kernel(operator.mul, TimeSeries, numbers.Real, out=True)
+def _mul_series_scalar(lhs, rhs, out=None):
+    return _elementwise(np.multiply, lhs.time, lhs.data, rhs, out)
+
+@pype.kernel(operator.mul, numbers.Real, TimeSeries, out=True)
+def _mul_scalar_series(lhs, rhs, out=None):
+    return _elementwise(np.multiply, rhs.time, lhs, rhs.data, out)
+
+@pype.kernel(operator.truediv, TimeSeries, TimeSeries, out=True)
+def _div_series(lhs, rhs, out=None):
+    lhs._check_times_helper(rhs)
+    return _elementwise(np.true_divide, lhs.time, lhs.data, rhs.data, out)
+
+@pype.kernel(operator.truediv, TimeSeries, numbers.Real, out=True)
+def _div_series_scalar(lhs, rhs, out=None):
+    return _elementwise(np.true_divide, lhs.time, lhs.data, rhs, out)
+
+@pype.kernel(operator.truediv, numbers.Real, TimeSeries, out=True)
+def _div_scalar_series(lhs, rhs, out=None):
+    return _elementwise(np.true_divide, rhs.time, lhs, rhs.data, out)
+
 def lazy(f):
     def inner(*args,**kwargs):
         inner.__name__ = f.__name__